@@ -0,0 +1,209 @@
+import argparse
+import asyncio
+import hashlib
+import io
+import math
+import random
+import struct
+from collections import Counter
+
+import shapely
+from aiohttp import web
+from shapely import STRtree
+
+from geo import load_world_gdf
+
+
+EARTH_RADIUS_M = 6371000.0
+CELL_SIZE_M = 5000.0  # coverage is decided per 5 km cell: a cell has panoramas with probability `density`
+
+
+def _unit(*parts):
+    """Deterministic uniform number in [0, 1) derived from the request parameters."""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=8).digest()
+    return struct.unpack(">Q", digest)[0] / 2 ** 64
+
+
+def _offset(lat, lng, distance_m, bearing):
+    """Move a point distance_m metres along the bearing (radians) on a sphere."""
+    angular = distance_m / EARTH_RADIUS_M
+    lat1, lng1 = math.radians(lat), math.radians(lng)
+    lat2 = math.asin(math.sin(lat1) * math.cos(angular) + math.cos(lat1) * math.sin(angular) * math.cos(bearing))
+    lng2 = lng1 + math.atan2(
+        math.sin(bearing) * math.sin(angular) * math.cos(lat1), math.cos(angular) - math.sin(lat1) * math.sin(lat2)
+    )
+    return math.degrees(lat2), (math.degrees(lng2) + 180) % 360 - 180
+
+
+class WorldIndex:
+    """Exact point-in-polygon lookup over the world GeoJSON, standing in for Google's reverse geocoder."""
+
+    def __init__(self, world_gdf):
+        codes = world_gdf["ISO_A2"].astype(str)
+        valid = codes.str.fullmatch(r"[A-Za-z]{2}") & world_gdf.geometry.notna()
+        self._geometries = world_gdf.geometry[valid].to_numpy()
+        self._codes = codes[valid].str.upper().to_numpy()
+        shapely.prepare(self._geometries)
+        self._tree = STRtree(self._geometries)
+
+    def country_at(self, lat, lng):
+        hits = self._tree.query(shapely.Point(lng, lat), predicate="intersects")
+        return self._codes[hits[0]] if len(hits) else None
+
+
+class FakeGoogleApi:
+    """Local, deterministic stand-in for the Street View metadata, Static and Geocoding APIs.
+
+    A metadata request finds coverage with the probability that at least one
+    5 km cell inside the search radius has panoramas (``density`` per cell,
+    overridable per country), then reports a panorama offset from the
+    requested point by a distance that shrinks as coverage gets denser.
+    Panoramas only exist on land, so a large radius near a border or coast can
+    land in the wrong country just as it does against Google. Answers are a
+    pure function of the request and ``seed``; ``latency`` (+ ``jitter``)
+    seconds are added to every response and ``error_rate`` of requests fail
+    with HTTP 500.
+    """
+
+    def __init__(self, world_gdf, density=0.3, country_density=None, latency=0.05, jitter=0.02, error_rate=0.0, seed=0):
+        self.index = WorldIndex(world_gdf)
+        self.density = density
+        self.country_density = {code.upper(): value for code, value in (country_density or {}).items()}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.seed = seed
+        self.calls = Counter()
+        self._image = None
+
+        self.app = web.Application()
+        self.app.router.add_get("/maps/api/streetview/metadata", self._metadata)
+        self.app.router.add_get("/maps/api/streetview", self._image_response)
+        self.app.router.add_get("/maps/api/geocode/json", self._geocode)
+        self.app.router.add_get("/_stats", self._stats)
+
+    async def _delay(self, endpoint, request):
+        self.calls[endpoint] += 1
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.error_rate and _unit(self.seed, "error", endpoint, request.query_string) < self.error_rate:
+            raise web.HTTPInternalServerError()
+
+    def _coverage_density(self, lat, lng):
+        code = self.index.country_at(lat, lng)
+        if code is None:
+            return 0.0
+        return self.country_density.get(code, self.density)
+
+    async def _metadata(self, request):
+        await self._delay("metadata", request)
+        try:
+            lat, lng = (float(value) for value in request.query["location"].split(","))
+            radius = float(request.query.get("radius", 50))
+        except (KeyError, ValueError):
+            return web.json_response({"status": "INVALID_REQUEST"})
+
+        density = self._coverage_density(lat, lng)
+        if density <= 0:
+            density = self.density  # a point at sea can still find coverage on a nearby coast
+        cells = max(1.0, math.pi * radius ** 2 / CELL_SIZE_M ** 2)
+        found_probability = 1 - (1 - min(density, 1.0)) ** cells
+        if _unit(self.seed, "found", lat, lng, radius) >= found_probability:
+            return web.json_response({"status": "ZERO_RESULTS"})
+
+        typical_distance = CELL_SIZE_M / math.sqrt(density) / 2
+        distance = min(radius, typical_distance * math.sqrt(-math.log(1 - _unit(self.seed, "distance", lat, lng, radius))))
+        pano_lat, pano_lng = _offset(lat, lng, distance, 2 * math.pi * _unit(self.seed, "bearing", lat, lng, radius))
+        if self.index.country_at(pano_lat, pano_lng) is None:
+            return web.json_response({"status": "ZERO_RESULTS"})  # no panoramas at sea
+
+        pano_id = hashlib.blake2b(f"{pano_lat:.5f},{pano_lng:.5f}".encode(), digest_size=11).hexdigest()
+        return web.json_response({
+            "status": "OK",
+            "pano_id": pano_id,
+            "location": {"lat": pano_lat, "lng": pano_lng},
+        })
+
+    async def _geocode(self, request):
+        await self._delay("geocode", request)
+        try:
+            lat, lng = (float(value) for value in request.query["latlng"].split(","))
+        except (KeyError, ValueError):
+            return web.json_response({"status": "INVALID_REQUEST", "results": []})
+        code = self.index.country_at(lat, lng)
+        if code is None:
+            return web.json_response({"status": "ZERO_RESULTS", "results": []})
+        component = {"long_name": code, "short_name": code, "types": ["country", "political"]}
+        return web.json_response({"status": "OK", "results": [{"address_components": [component]}]})
+
+    async def _image_response(self, request):
+        await self._delay("image", request)
+        if self._image is None:
+            from PIL import Image
+
+            output = io.BytesIO()
+            Image.new("RGB", (1200, 675), (90, 140, 90)).save(output, format="JPEG")
+            self._image = output.getvalue()
+        return web.Response(body=self._image, content_type="image/jpeg")
+
+    async def _stats(self, request):
+        return web.json_response(dict(self.calls))
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Serve on host:port (0 picks a free port); returns the base URL."""
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = self._runner.addresses[0][1]
+        return f"http://{host}:{bound_port}"
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+
+def parse_country_density(values):
+    """Parse repeated ``CODE=DENSITY`` options."""
+    densities = {}
+    for value in values or ():
+        code, _, density = value.partition("=")
+        densities[code.strip().upper()] = float(density)
+    return densities
+
+
+def add_server_arguments(parser):
+    parser.add_argument("--world", default="data/ne_admin_0_map_units_50m.geojson", help="world GeoJSON the answers are derived from")
+    parser.add_argument("--density", type=float, default=0.3, help="share of 5 km land cells with Street View coverage")
+    parser.add_argument("--country-density", action="append", metavar="CODE=DENSITY", help="per-country coverage override (repeatable)")
+    parser.add_argument("--latency-ms", type=float, default=50, help="added latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=20, help="uniform random extra latency per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with HTTP 500")
+    parser.add_argument("--seed", type=int, default=0, help="seed for coverage decisions")
+
+
+def server_from_arguments(args):
+    return FakeGoogleApi(
+        load_world_gdf(args.world),
+        density=args.density,
+        country_density=parse_country_density(args.country_density),
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the Google Street View and Geocoding APIs.")
+    add_server_arguments(parser)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    args = parser.parse_args()
+    server = server_from_arguments(args)
+    print(f"Fake Google API on http://{args.host}:{args.port} (set GOOGLE_API_BASE_URL to this)")
+    web.run_app(server.app, host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from bench.fake_google import add_server_arguments, server_from_arguments
+
+
+def _configure_environment(base_url, workdir, args):
+    """g.py reads its configuration at import time, so this must run before importing it.
+
+    Every setting that changes how a search behaves is pinned here, so results
+    do not depend on the local .env or on files left in data/.
+    """
+    os.environ["GOOGLE_API_BASE_URL"] = base_url
+    os.environ["GOOGLE_MAPS_API_KEY"] = "bench"
+    os.environ["LOCATION_CACHE_PATH"] = os.path.join(workdir, "locations.sqlite3")
+    os.environ["SEARCH_STATS_PATH"] = os.path.join(workdir, "search_stats.json")
+    os.environ["GAME_STORE_PATH"] = os.path.join(workdir, "games.sqlite3")
+    os.environ["GOOGLE_API_BUDGET_PATH"] = os.path.join(workdir, "api_budget.json")
+    os.environ["TRACE_LOG_SPANS"] = "0"
+    os.environ["SEARCH_PROBE_BATCH_SIZE"] = str(args.batch_size)
+    os.environ["REMOTE_GEOCODE_FALLBACK"] = "0" if args.no_geocode_fallback else "1"
+    os.environ["BBOX_SAMPLER_SHARE"] = "1" if args.sampler == "bbox" else "0"
+    # Without --api-rate the limiter is effectively off, so the benchmark measures the search rather than the bucket.
+    api_rate = str(args.api_rate) if args.api_rate > 0 else "1e9"
+    os.environ["GOOGLE_API_RATE_PER_SECOND"] = api_rate
+    os.environ["GOOGLE_API_BURST"] = api_rate
+    os.environ["GOOGLE_API_DAILY_BUDGET_USD"] = "0"
+    # A path that does not exist turns coverage-weighted sampling off.
+    os.environ["COVERAGE_GRID_PATH"] = args.coverage or os.path.join(workdir, "coverage.npz")
+
+
+async def _make_cog(args):
+    import aiohttp
+    import numpy as np
+
+    import g
+
+    cog = g.CountryGuesser(bot=None)
+    cog.http_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=g.GOOGLE_HTTP_TIMEOUT))
+    cog.sample_rng = np.random.default_rng(args.seed)
+    await cog.location_store.open()
+    # The bot must see the same geometry the fake server answers from.
+    cog.world_gdf, cog.country_resolver, cog.location_sampler = await asyncio.to_thread(cog._build_world_data, args.world)
+    return cog
+
+
+async def _close_cog(cog):
+    await cog.http_session.close()
+    await cog.location_store.close()
+
+
+async def run_benchmark(args):
+    server = server_from_arguments(args)
+    base_url = await server.start()
+    with tempfile.TemporaryDirectory() as workdir:
+        _configure_environment(base_url, workdir, args)
+        cog = await _make_cog(args)
+        random.seed(args.seed)
+        countries = list(cog.country_data.codes)
+        if args.countries:
+            countries = [code.lower() for code in args.countries]
+
+        rows = []
+        started = time.perf_counter()
+        try:
+            for code in countries:
+                for _ in range(args.repeat):
+                    calls_before = sum(server.calls[endpoint] for endpoint in ("metadata", "geocode"))
+                    search_started = time.perf_counter()
+                    # The search logs every attempt with print(); keep the report readable unless asked
+                    with contextlib.redirect_stdout(sys.stdout if args.verbose else io.StringIO()):
+                        location = await cog._get_street_view_in_country(code)
+                    rows.append({
+                        "country": code,
+                        "success": bool(location),
+                        "seconds": time.perf_counter() - search_started,
+                        "api_calls": sum(server.calls[endpoint] for endpoint in ("metadata", "geocode")) - calls_before,
+                    })
+        finally:
+            wall_time = time.perf_counter() - started
+            await _close_cog(cog)
+            await server.stop()
+
+    successes = sum(row["success"] for row in rows)
+    total_calls = sum(row["api_calls"] for row in rows)
+    return {
+        "searches": len(rows),
+        "successes": successes,
+        "failure_rate": 1 - successes / len(rows) if rows else None,
+        "wall_time_seconds": wall_time,
+        "api_calls": dict(server.calls),
+        "api_calls_per_success": total_calls / successes if successes else None,
+        "countries": rows,
+    }
+
+
+def _print_report(result, verbose):
+    if verbose:
+        print(f"{'country':<8} {'ok':<3} {'calls':>6} {'seconds':>8}")
+        for row in result["countries"]:
+            print(f"{row['country']:<8} {'y' if row['success'] else 'n':<3} {row['api_calls']:>6} {row['seconds']:>8.2f}")
+        print()
+    if not result["searches"]:
+        print("No searches were run.")
+        return
+    calls_per_success = result["api_calls_per_success"]
+    print(f"searches:              {result['searches']}")
+    print(f"failure rate:          {result['failure_rate']:.1%}")
+    print(f"wall time:             {result['wall_time_seconds']:.1f}s")
+    print(f"API calls per success: {calls_per_success:.2f}" if calls_per_success is not None else "API calls per success: -")
+    print(f"API calls by endpoint: {result['api_calls']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the Street View location search for every country against the local fake Google API."
+    )
+    add_server_arguments(parser)
+    parser.add_argument("--countries", nargs="*", help="ISO_A2 codes to search (default: every code in countries.txt)")
+    parser.add_argument("--repeat", type=int, default=1, help="searches per country")
+    parser.add_argument("--sampler", choices=("polygon", "bbox"), default="polygon")
+    parser.add_argument("--batch-size", type=int, default=1, help="SEARCH_PROBE_BATCH_SIZE for the search")
+    parser.add_argument("--api-rate", type=float, default=0,
+                        help="GOOGLE_API_RATE_PER_SECOND (and burst) for the search (default: no rate limit)")
+    parser.add_argument("--coverage", metavar="PATH", help="coverage grid from build_coverage.py to sample with (default: none)")
+    parser.add_argument("--no-geocode-fallback", action="store_true", help="never call the geocoder for border panoramas")
+    parser.add_argument("--json", metavar="PATH", help="also write the full result as JSON (for comparing runs in CI)")
+    parser.add_argument("--max-failure-rate", type=float, help="exit with status 1 when the failure rate is higher")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print one line per search")
+    args = parser.parse_args()
+
+    result = asyncio.run(run_benchmark(args))
+    _print_report(result, args.verbose)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    if args.max_failure_rate is not None and (result["failure_rate"] or 0) > args.max_failure_rate:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
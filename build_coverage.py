@@ -0,0 +1,187 @@
+import argparse
+import asyncio
+import os
+import time
+
+import aiohttp
+import numpy as np
+from dotenv import load_dotenv
+
+from country_data import load_country_data
+from coverage_grid import CoverageGrid
+from geo import CountryResolver, CountrySampler, load_world_gdf
+from rate_limit import ApiRateLimiter
+
+
+load_dotenv()
+
+GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
+GOOGLE_API_BASE_URL = os.getenv("GOOGLE_API_BASE_URL", "https://maps.googleapis.com").rstrip("/")
+
+
+class CoverageBuilder:
+    """Probes the Street View metadata endpoint across each country's grid and records hits per cell.
+
+    Probes run through ``concurrency`` workers behind a shared rate limiter.
+    A probe is a hit when the returned panorama lies inside the cell's
+    country. Progress lives in the grid itself (per-cell probe counts), which
+    is checkpointed every ``checkpoint_seconds``, so an interrupted build
+    resumes where it stopped. Metadata requests are not billed by Google.
+    """
+
+    def __init__(self, grid, resolver, session, limiter, probes_per_cell, radius, concurrency, checkpoint, checkpoint_seconds=30.0, seed=None):
+        self.grid = grid
+        self.resolver = resolver
+        self.session = session
+        self.limiter = limiter
+        self.probes_per_cell = probes_per_cell
+        self.radius = radius
+        self.concurrency = concurrency
+        self.checkpoint = checkpoint
+        self.checkpoint_seconds = checkpoint_seconds
+        self.rng = np.random.default_rng(seed)
+        self.done = 0
+        self.hits = 0
+        self.errors = 0
+
+    def pending_probes(self, country_codes):
+        jobs = []
+        for code in country_codes:
+            country = self.grid.countries.get(code)
+            if country is None:
+                continue
+            for cell, probes in enumerate(country["probes"]):
+                jobs.extend([(code, cell)] * max(0, self.probes_per_cell - int(probes)))
+        return jobs
+
+    async def _probe(self, code, cell):
+        country = self.grid.countries[code]
+        lat, lng = country["centres"][cell] + self.rng.uniform(-country["cell_size"] / 2, country["cell_size"] / 2, size=2)
+        url = (
+            f"{GOOGLE_API_BASE_URL}/maps/api/streetview/metadata?"
+            f"location={lat},{lng}&radius={self.radius}&source=outdoor&key={GOOGLE_MAPS_API_KEY}"
+        )
+        await self.limiter.acquire("streetview_metadata")
+        try:
+            async with self.session.get(url) as response:
+                response.raise_for_status()
+                metadata = await response.json(content_type=None)
+        except (asyncio.TimeoutError, aiohttp.ClientError, ValueError):
+            self.errors += 1
+            return  # Not recorded, so the probe is retried on the next run
+        status = metadata.get("status")
+        if status not in ("OK", "ZERO_RESULTS"):
+            self.errors += 1
+            return
+        hit = status == "OK" and self.resolver.match(metadata["location"]["lat"], metadata["location"]["lng"], code) is True
+        self.grid.record(code, cell, hit)
+        self.done += 1
+        self.hits += hit
+
+    async def _worker(self, queue):
+        while True:
+            try:
+                code, cell = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await self._probe(code, cell)
+
+    async def _checkpoint_loop(self, total):
+        started = time.monotonic()
+        while True:
+            await asyncio.sleep(self.checkpoint_seconds)
+            await asyncio.to_thread(self.grid.save, self.checkpoint)
+            elapsed = time.monotonic() - started
+            rate = self.done / elapsed if elapsed else 0
+            print(f"{self.done}/{total} probes, {self.hits} hits, {self.errors} errors, {rate:.1f} probes/s - checkpoint saved")
+
+    async def run(self, country_codes):
+        jobs = self.pending_probes(country_codes)
+        if not jobs:
+            print("Every cell already has the requested number of probes.")
+            return
+        print(f"{len(jobs)} probes to run across {len(country_codes)} countries.")
+        queue = asyncio.Queue()
+        for job in jobs:
+            queue.put_nowait(job)
+        checkpoints = asyncio.create_task(self._checkpoint_loop(len(jobs)))
+        try:
+            await asyncio.gather(*(self._worker(queue) for _ in range(self.concurrency)))
+        finally:
+            checkpoints.cancel()
+            self.grid.save(self.checkpoint)
+            print(f"Saved {self.checkpoint}: {self.done} probes, {self.hits} hits, {self.errors} errors this run.")
+
+
+async def build(args):
+    if not GOOGLE_MAPS_API_KEY:
+        raise SystemExit("GOOGLE_MAPS_API_KEY is not set.")
+    country_data = load_country_data()
+    codes = [code.lower() for code in args.countries] if args.countries else list(country_data.codes)
+    world_gdf = load_world_gdf(args.world)
+    resolver = CountryResolver(world_gdf, country_data.bounds)
+    cells = CountrySampler(world_gdf, country_data.bounds, target_cells=args.cells_per_country)
+
+    meta = {"cells_per_country": args.cells_per_country, "probes_per_cell": args.probes_per_cell, "radius": args.radius}
+    if os.path.exists(args.out) and not args.restart:
+        grid = CoverageGrid.load(args.out)
+        if grid.meta.get("cells_per_country") != args.cells_per_country:
+            raise SystemExit(
+                f"{args.out} was built with {grid.meta.get('cells_per_country')} cells per country; "
+                "pass the same --cells-per-country to resume or --restart to start over."
+            )
+        grid.meta.update(meta)
+        print(f"Resuming {args.out} ({len(grid.countries)} countries so far).")
+    else:
+        grid = CoverageGrid(meta)
+    for code in codes:
+        if code in grid:
+            continue
+        country_cells = cells.cells(code)
+        if country_cells is None:
+            print(f"No geometry for {code}; skipping.")
+            continue
+        centres, _, cell_size = country_cells
+        grid.add_country(code, centres, cell_size)
+
+    limiter = ApiRateLimiter(args.rate, burst=args.rate)
+    timeout = aiohttp.ClientTimeout(total=10)
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        builder = CoverageBuilder(
+            grid, resolver, session, limiter,
+            probes_per_cell=args.probes_per_cell,
+            radius=args.radius,
+            concurrency=args.concurrency,
+            checkpoint=args.out,
+            checkpoint_seconds=args.checkpoint_seconds,
+            seed=args.seed,
+        )
+        await builder.run(codes)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build a per-country Street View coverage grid for coverage-weighted location sampling. "
+                    "Interrupted runs resume from the last checkpoint."
+    )
+    parser.add_argument("--out", default="data/coverage.npz", help="coverage grid file to create or resume")
+    parser.add_argument("--world", default="data/ne_admin_0_map_units_50m.geojson")
+    parser.add_argument("--countries", nargs="*", help="ISO_A2 codes to build (default: every code in countries.txt)")
+    parser.add_argument("--cells-per-country", type=int, default=400, help="approximate grid cells per country")
+    parser.add_argument("--probes-per-cell", type=int, default=3, help="metadata probes per cell; raise it and rerun to refine")
+    parser.add_argument("--radius", type=int, default=5000, help="metadata search radius in metres")
+    parser.add_argument("--concurrency", type=int, default=16, help="probes in flight")
+    parser.add_argument("--rate", type=float, default=25, help="metadata requests per second")
+    parser.add_argument("--checkpoint-seconds", type=float, default=30)
+    parser.add_argument("--restart", action="store_true", help="ignore an existing file and start over")
+    parser.add_argument("--seed", type=int, help="seed for the probe points inside each cell")
+    args = parser.parse_args()
+    try:
+        asyncio.run(build(args))
+    except KeyboardInterrupt:
+        print("Interrupted; rerun the same command to resume from the last checkpoint.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import asyncio
+import json
+import os
+from types import MappingProxyType
+
+from guess_resolver import load_country_aliases
+
+
+COUNTRIES_PATH = "countries.txt"
+COUNTRY_BOUNDS_PATH = "country_bounds.txt"
+CONTINENTS_PATH = "continents.json"
+COUNTRY_ALIASES_PATH = "country_aliases.json"
+
+DATA_PATHS = (COUNTRIES_PATH, COUNTRY_BOUNDS_PATH, CONTINENTS_PATH, COUNTRY_ALIASES_PATH)
+
+_EMPTY = frozenset()
+
+
+class CountryData:
+    """Immutable snapshot of the country tables compiled from the project data files.
+
+    Every table is a read-only mapping (continent membership is a frozenset
+    per continents.json key), so a snapshot can be shared freely and replaced
+    wholesale by assigning a new one; code holding the old snapshot keeps a
+    consistent view until it is done.
+    """
+
+    __slots__ = ("name_to_code", "code_to_name", "codes", "bounds", "continents", "aliases", "signature")
+
+    def __init__(self, name_to_code, code_to_name, bounds, continents, aliases, signature=None):
+        self.name_to_code = MappingProxyType(dict(name_to_code))
+        self.code_to_name = MappingProxyType(dict(code_to_name))
+        self.codes = tuple(sorted(code_to_name))
+        self.bounds = MappingProxyType({code: tuple(box) for code, box in bounds.items()})
+        self.continents = MappingProxyType({name: frozenset(codes) for name, codes in continents.items()})
+        self.aliases = MappingProxyType(dict(aliases))
+        self.signature = signature
+
+    def continent(self, name):
+        """Codes of the countries in a continents.json group (e.g. "Europe")."""
+        return self.continents.get(name, _EMPTY)
+
+
+def data_signature(paths=DATA_PATHS):
+    """(mtime_ns, size) of each data file, or None for missing ones; changes whenever a file is edited."""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            signature.append(None)
+        else:
+            signature.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def _read_countries(path):
+    name_to_code = {}
+    code_to_name = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.strip().split('\t')
+                if len(parts) == 2:
+                    name, code = parts[0].strip(), parts[1].strip().lower()
+                    name_to_code[name.lower()] = code
+                    code_to_name[code] = name
+                else:
+                    print(f"Error in {path}: {line.strip()}")
+        print(f"Loaded {len(name_to_code)} country name mappings.")
+        print(f"Loaded {len(code_to_name)} country code mappings.")
+    except FileNotFoundError:
+        print(f"Error: {path} not found. Country name guessing will not work.")
+    except Exception as e:
+        print(f"Error loading {path}: {e}")
+    return name_to_code, code_to_name
+
+
+def _read_bounds(path):
+    bounds = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                parts = line.split()
+                if len(parts) >= 5:  # code, south, west, north, east
+                    try:
+                        bounds[parts[0].lower()] = (float(parts[1]), float(parts[2]), float(parts[3]), float(parts[4]))
+                    except ValueError:
+                        print(f"Error parsing coordinates in {path}: {line}")
+                else:
+                    print(f"Invalid format in {path}: {line}")
+        print(f"Loaded {len(bounds)} country bounds.")
+    except FileNotFoundError:
+        print(f"Warning: {path} not found. Using default world bounds for all countries.")
+    except Exception as e:
+        print(f"Error loading {path}: {e}")
+    return bounds
+
+
+def _read_continents(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        print(f"CRITICAL ERROR: {path} not found. Continent-specific data (e.g., for /eu map) will not be available.")
+        return {}
+    except json.JSONDecodeError as e:
+        print(f"CRITICAL ERROR: Failed to decode {path}: {e}. Continent-specific data will not be available.")
+        return {}
+    continents = {name: {code.lower() for code in codes} for name, codes in data.items()}
+    for name, codes in continents.items():
+        print(f"Loaded {name} countries: {len(codes)}")
+    return continents
+
+
+def load_country_data(countries_path=COUNTRIES_PATH, bounds_path=COUNTRY_BOUNDS_PATH,
+                      continents_path=CONTINENTS_PATH, aliases_path=COUNTRY_ALIASES_PATH):
+    """Read the data files into a new CountryData snapshot (blocking; run it in a thread when reloading)."""
+    paths = (countries_path, bounds_path, continents_path, aliases_path)
+    signature = data_signature(paths)
+    name_to_code, code_to_name = _read_countries(countries_path)
+    return CountryData(
+        name_to_code,
+        code_to_name,
+        _read_bounds(bounds_path),
+        _read_continents(continents_path),
+        load_country_aliases(aliases_path),
+        signature=signature,
+    )
+
+
+class CountryDataWatcher:
+    """Polls the data files and hands a freshly built snapshot to ``on_reload`` when any of them changes.
+
+    The snapshot is built in a worker thread; ``on_reload(data)`` runs on the
+    event loop and is expected to swap it in with plain assignments.
+    """
+
+    def __init__(self, current, on_reload, interval=5.0, paths=DATA_PATHS):
+        self.interval = interval
+        self.paths = paths
+        self._on_reload = on_reload
+        self._signature = current.signature
+        self._task = None
+
+    def start(self):
+        if self.interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            signature = data_signature(self.paths)
+            if signature == self._signature:
+                continue
+            # Let an editor finish writing before reading the files.
+            await asyncio.sleep(min(1.0, self.interval))
+            signature = data_signature(self.paths)
+            try:
+                data = await asyncio.to_thread(load_country_data, *self.paths)
+                await self._on_reload(data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Reloading country data failed, keeping the previous tables: {e}")
+            self._signature = signature
@@ -0,0 +1,113 @@
+import json
+import os
+
+import numpy as np
+
+from geo import sample_cells
+
+
+COVERAGE_FORMAT_VERSION = 1
+
+
+class CoverageGrid:
+    """Per-country grid of cells with Street View probe counts, stored as one compressed .npz file.
+
+    Each country has cell centres (lat, lng as float32), the cell size in
+    degrees and per-cell ``probes`` and ``hits`` counters (uint16); the file
+    holds nothing else, so the whole world fits in a few megabytes.
+    """
+
+    def __init__(self, meta=None):
+        self.meta = dict(meta or {})
+        self.countries = {}  # code -> {"centres", "cell_size", "probes", "hits"}
+
+    def __contains__(self, country_code):
+        return country_code.lower() in self.countries
+
+    def add_country(self, country_code, centres, cell_size):
+        """Start an empty grid for the country (replacing any previous one)."""
+        self.countries[country_code.lower()] = {
+            "centres": np.asarray(centres, dtype=np.float32),
+            "cell_size": float(cell_size),
+            "probes": np.zeros(len(centres), dtype=np.uint16),
+            "hits": np.zeros(len(centres), dtype=np.uint16),
+        }
+
+    def record(self, country_code, cell, hit):
+        country = self.countries[country_code.lower()]
+        if country["probes"][cell] < np.iinfo(np.uint16).max:
+            country["probes"][cell] += 1
+            country["hits"][cell] += bool(hit)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("version") != COVERAGE_FORMAT_VERSION:
+                raise ValueError(f"{path} has coverage format {meta.get('version')}, expected {COVERAGE_FORMAT_VERSION}")
+            grid = cls(meta)
+            for code in meta.get("countries", []):
+                grid.countries[code] = {
+                    "centres": data[f"{code}.centres"],
+                    "cell_size": float(data[f"{code}.cell_size"]),
+                    "probes": data[f"{code}.probes"],
+                    "hits": data[f"{code}.hits"],
+                }
+        return grid
+
+    def save(self, path):
+        """Write the grid atomically, so an interrupted build leaves the last checkpoint intact."""
+        arrays = {}
+        for code, country in self.countries.items():
+            arrays[f"{code}.centres"] = country["centres"]
+            arrays[f"{code}.cell_size"] = np.float32(country["cell_size"])
+            arrays[f"{code}.probes"] = country["probes"]
+            arrays[f"{code}.hits"] = country["hits"]
+        meta = {**self.meta, "version": COVERAGE_FORMAT_VERSION, "countries": sorted(self.countries)}
+        arrays["meta"] = np.array(json.dumps(meta))
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+
+class CoverageSampler:
+    """Candidate sampler that favours grid cells where the coverage builder found panoramas.
+
+    Cells are drawn in proportion to their smoothed hit rate times their
+    area, so unprobed or empty cells keep a small share (coverage changes
+    over time) while almost every candidate lands where panoramas were
+    found. Countries missing from the grid fall back to ``fallback``.
+    """
+
+    def __init__(self, grid, fallback, prior_hits=0.05, prior_probes=1.0):
+        self.grid = grid
+        self.fallback = fallback
+        self._weights = {}
+        for code, country in grid.countries.items():
+            if not country["hits"].any():
+                continue  # nothing found at all; the plain polygon sampler does no worse
+            density = (country["hits"] + prior_hits) / (country["probes"] + prior_probes)
+            weights = density * np.maximum(np.cos(np.radians(country["centres"][:, 0])), 1e-6)
+            self._weights[code] = weights / weights.sum()
+
+    def __contains__(self, country_code):
+        return country_code.lower() in self._weights or country_code in self.fallback
+
+    def set_country_bounds(self, country_bounds):
+        self.fallback.set_country_bounds(country_bounds)
+
+    def label(self, country_code):
+        if country_code.lower() in self._weights:
+            return "coverage"
+        return self.fallback.label(country_code)
+
+    def sample(self, country_code, n, rng=None):
+        code = country_code.lower()
+        weights = self._weights.get(code)
+        if weights is None:
+            return self.fallback.sample(country_code, n, rng=rng)
+        country = self.grid.countries[code]
+        return sample_cells(country["centres"].astype(np.float64), weights, country["cell_size"], n, rng)
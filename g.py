@@ -1,111 +1,140 @@
 import discord
-from discord.ext import commands
-import requests
+from discord.ext import commands, tasks
+import aiohttp
 import random
 import os
 import asyncio
 from dotenv import load_dotenv
-import plotly.express as px
-import plotly.io as pio
-import geopandas as gpd
 import io
-import json
+import contextlib
+import datetime
+import hashlib
+import multiprocessing
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from location_pool import LocationPool
+from location_store import LocationStore
+from game_store import GameStore, LEADERBOARDS
+from geo import CountryResolver, CountrySampler, load_world_gdf, sample_in_bounds
+from coverage_grid import CoverageGrid, CoverageSampler
+import map_render
+from caches import ByteLRUCache, ExpiringDict
+from streetview_images import compose_grid, fetch_image
+from outbound import OutboundSender, PRIORITY_HINT, PRIORITY_RESULT
+from search_stats import SearchStats
+from guess_resolver import GuessResolver
+from country_data import CONTINENTS_PATH, CountryDataWatcher, load_country_data
+import metrics
+from tracing import Tracer
+from shared_state import SharedState
+from rate_limit import ApiRateLimiter, BudgetExhausted, PRIORITY_USER, background_priority, current_priority
 
 
 load_dotenv()
 
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
+# Overridden by the offline benchmarks (bench/) to point at a local stand-in for the Google APIs
+GOOGLE_API_BASE_URL = os.getenv("GOOGLE_API_BASE_URL", "https://maps.googleapis.com").rstrip("/")
 
-COUNTRY_NAME_TO_CODE = {}
-COUNTRY_CODE_TO_NAME = {}
+WORLD_GEOJSON_PATH = "data/ne_admin_0_map_units_50m.geojson"
 
+# How often (seconds) to check countries.txt, country_bounds.txt, continents.json and
+# country_aliases.json for edits and hot-swap the rebuilt tables (0 = never reload)
+COUNTRY_DATA_RELOAD_SECONDS = float(os.getenv("COUNTRY_DATA_RELOAD_SECONDS", "5"))
 
-COUNTRY_BOUNDS = {}
+# Per-country watermarks for the background pool of pre-validated panoramas
+LOCATION_POOL_LOW_WATERMARK = int(os.getenv("LOCATION_POOL_LOW_WATERMARK", "1"))
+LOCATION_POOL_HIGH_WATERMARK = int(os.getenv("LOCATION_POOL_HIGH_WATERMARK", "2"))
 
-WORLD_GEOJSON_PATH = "data/ne_admin_0_map_units_50m.geojson"
+# Hint locations fetched in the background when a game starts, so the first hints are instant (0 = off)
+HINT_PREFETCH_COUNT = int(os.getenv("HINT_PREFETCH_COUNT", "2"))
+# Also stitch the first prefetched hint's composite; costs four Static API images per game even without a hint
+HINT_PREFETCH_COMPOSITE = os.getenv("HINT_PREFETCH_COMPOSITE", "0") == "1"
 
-eu_countries = []
-as_countries = []
-af_countries = []
-am_countries = []
-
-def load_country_data():
-    """Load country metadata and continent groupings from project files."""
-    try:
-        with open("countries.txt", "r", encoding="utf-8") as f:
-            for line in f:
-                parts = line.strip().split('\t')
-                if len(parts) == 2:
-                    name, code = parts[0].strip(), parts[1].strip().lower()
-                    COUNTRY_NAME_TO_CODE[name.lower()] = code
-                    COUNTRY_CODE_TO_NAME[code] = name
-                else:
-                    print(f"Error in countries.txt: {line.strip()}")
-        print(f"Loaded {len(COUNTRY_NAME_TO_CODE)} country name mappings.")
-        print(f"Loaded {len(COUNTRY_CODE_TO_NAME)} country code mappings.")
-        
-    except FileNotFoundError:
-        print("Error: countries.txt not found. Country name guessing will not work.")
-    except Exception as e:
-        print(f"Error loading countries.txt: {e}")
-        
-    
-    # Load country bounds data
-    try:
-        with open("country_bounds.txt", "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith('#'):
-                    continue
-                parts = line.split()
-                if len(parts) >= 5:  # code, south, west, north, east
-                    try:
-                        code = parts[0].lower()
-                        south = float(parts[1])
-                        west = float(parts[2])
-                        north = float(parts[3])
-                        east = float(parts[4])
-                        COUNTRY_BOUNDS[code] = [south, west, north, east]
-                    except ValueError:
-                        print(f"Error parsing coordinates in country_bounds.txt: {line}")
-                else:
-                    print(f"Invalid format in country_bounds.txt: {line}")
-        print(f"Loaded {len(COUNTRY_BOUNDS)} country bounds.")
-    except FileNotFoundError:
-        print("Warning: country_bounds.txt not found. Using default world bounds for all countries.")
-    except Exception as e:
-        print(f"Error loading country_bounds.txt: {e}")
-
-    global eu_countries, as_countries, af_countries, am_countries
-
-    try:
-        with open("continents.json", "r", encoding="utf-8") as f:
-            data = json.load(f)
-        eu_countries = [code.lower() for code in data.get("Europe", [])]
-        as_countries = [code.lower() for code in data.get("Asia", [])]
-        af_countries = [code.lower() for code in data.get("Africa", [])]
-        am_countries = [code.lower() for code in data.get("America", [])]
-        print(f"Loaded Europe countries: {len(eu_countries)}")
-        print(f"Loaded Asia countries: {len(as_countries)}")
-        print(f"Loaded Africa countries: {len(af_countries)}")
-        print(f"Loaded America countries: {len(am_countries)}")
-    except FileNotFoundError:
-        print("CRITICAL ERROR: continents.json not found. Continent-specific data (e.g., for /eu map) will not be available.")
-    except json.JSONDecodeError as e:
-        print(f"CRITICAL ERROR: Failed to decode continents.json: {e}. Continent-specific data will not be available.")
-    except Exception as e:
-        print(f"CRITICAL ERROR: An unexpected error occurred while loading continents.json: {e}. Continent-specific data will not be available.")
+# Shared HTTP session for Google API calls
+GOOGLE_HTTP_TIMEOUT = float(os.getenv("GOOGLE_HTTP_TIMEOUT", "10"))
+GOOGLE_HTTP_CONNECT_TIMEOUT = float(os.getenv("GOOGLE_HTTP_CONNECT_TIMEOUT", "5"))
+GOOGLE_HTTP_MAX_CONNECTIONS = int(os.getenv("GOOGLE_HTTP_MAX_CONNECTIONS", "32"))
+GOOGLE_HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("GOOGLE_HTTP_MAX_CONNECTIONS_PER_HOST", "16"))
+GOOGLE_HTTP_DNS_CACHE_SECONDS = int(os.getenv("GOOGLE_HTTP_DNS_CACHE_SECONDS", "300"))
+
+# Shared limit on Google API calls per second (token bucket) and a daily spend budget in USD (0 = unlimited).
+# Background prefetching stops at GOOGLE_API_BACKGROUND_BUDGET_SHARE of the budget; once it is spent,
+# games are served from cached locations only.
+GOOGLE_API_RATE_PER_SECOND = float(os.getenv("GOOGLE_API_RATE_PER_SECOND", "20"))
+GOOGLE_API_BURST = float(os.getenv("GOOGLE_API_BURST", "40"))
+GOOGLE_API_DAILY_BUDGET_USD = float(os.getenv("GOOGLE_API_DAILY_BUDGET_USD", "0"))
+GOOGLE_API_BACKGROUND_BUDGET_SHARE = float(os.getenv("GOOGLE_API_BACKGROUND_BUDGET_SHARE", "0.8"))
+GOOGLE_API_BUDGET_PATH = os.getenv("GOOGLE_API_BUDGET_PATH", "data/api_budget.json")
+
+# Probes fired concurrently per search wave (1 = sequential) and the cap on probes in flight across all searches
+SEARCH_PROBE_BATCH_SIZE = int(os.getenv("SEARCH_PROBE_BATCH_SIZE", "1"))
+SEARCH_MAX_CONCURRENT_PROBES = int(os.getenv("SEARCH_MAX_CONCURRENT_PROBES", "8"))
+
+# Continent maps are rendered in worker processes; extra requests beyond the queue limit are turned away
+MAP_RENDER_WORKERS = int(os.getenv("MAP_RENDER_WORKERS", "1"))
+MAP_RENDER_MAX_QUEUE = int(os.getenv("MAP_RENDER_MAX_QUEUE", "4"))
+MAP_RENDER_TIMEOUT = float(os.getenv("MAP_RENDER_TIMEOUT", "60"))
+MAP_CACHE_MAX_BYTES = int(os.getenv("MAP_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Byte budget for stitched four-direction panorama images, cached per pano_id
+PANORAMA_CACHE_MAX_BYTES = int(os.getenv("PANORAMA_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Caps on location searches running at once, overall and per guild, so one busy guild cannot starve the rest
+MAX_CONCURRENT_SEARCHES = int(os.getenv("MAX_CONCURRENT_SEARCHES", "8"))
+MAX_CONCURRENT_SEARCHES_PER_GUILD = int(os.getenv("MAX_CONCURRENT_SEARCHES_PER_GUILD", "2"))
+
+# Per-country search outcomes used to adapt the radius order and attempt budget
+SEARCH_STATS_PATH = os.getenv("SEARCH_STATS_PATH", "data/search_stats.json")
+SEARCH_RADII = [1000, 10000, 100000, 1000000]
+
+# Stage timing spans: each finished span is logged as JSON (unless disabled) and the last
+# TRACE_WINDOW durations per stage and country are kept for `!trace_stats`
+TRACE_LOG_SPANS = os.getenv("TRACE_LOG_SPANS", "1") != "0"
+TRACE_WINDOW = int(os.getenv("TRACE_WINDOW", "500"))
+
+# Durable cache of validated panoramas and its reuse policy
+LOCATION_CACHE_PATH = os.getenv("LOCATION_CACHE_PATH", "data/locations.sqlite3")
+LOCATION_CACHE_REUSE_SECONDS = float(os.getenv("LOCATION_CACHE_REUSE_SECONDS", str(24 * 3600)))
+LOCATION_CACHE_MAX_SERVES = int(os.getenv("LOCATION_CACHE_MAX_SERVES", "10"))
 
+# Active games, incorrect guesses and per-guild leaderboards; writes are batched every GAME_STORE_FLUSH_SECONDS
+GAME_STORE_PATH = os.getenv("GAME_STORE_PATH", "data/games.sqlite3")
+GAME_STORE_FLUSH_SECONDS = float(os.getenv("GAME_STORE_FLUSH_SECONDS", "2"))
+
+# Ask the Geocoding API about panoramas the offline resolver cannot place (e.g. right on a border)
+REMOTE_GEOCODE_FALLBACK = os.getenv("REMOTE_GEOCODE_FALLBACK", "1") != "0"
+
+# Share of searches that still sample the country_bounds.txt box, to compare hit rates against the polygon sampler
+BBOX_SAMPLER_SHARE = float(os.getenv("BBOX_SAMPLER_SHARE", "0"))
+
+# Street View coverage grid written by build_coverage.py; when present, candidates favour cells where panoramas were found
+COVERAGE_GRID_PATH = os.getenv("COVERAGE_GRID_PATH", "data/coverage.npz")
+
+# Sharded deployments (see supervisor.py): the shard processes share rendered maps and the API budget through
+# SHARED_STATE_PATH and pick up each other's cached panoramas every SHARED_STATE_SYNC_SECONDS (empty = single process)
+SHARED_STATE_PATH = os.getenv("SHARED_STATE_PATH", "")
+SHARED_STATE_SYNC_SECONDS = float(os.getenv("SHARED_STATE_SYNC_SECONDS", "5"))
+SHARED_MAP_CACHE_MAX_BYTES = int(os.getenv("SHARED_MAP_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+SHARD_IDS = os.getenv("SHARD_IDS", "")
 
 class CountryGuesser(commands.Cog, name="CountryGuesser"):
     def __init__(self, bot):
         self.bot = bot
-        self.current_game = None
+        self.http_session = None  # Created in cog_load, closed in cog_unload
+        self.games = {}  # channel_id -> active game state
+        self._starting_channels = set()  # channels with a !g search in flight
+        self._search_semaphore = asyncio.Semaphore(max(1, MAX_CONCURRENT_SEARCHES))
+        self._guild_search_semaphores = defaultdict(lambda: asyncio.Semaphore(max(1, MAX_CONCURRENT_SEARCHES_PER_GUILD)))
         self.max_retries_location = 30
+        self.probe_batch_size = max(1, SEARCH_PROBE_BATCH_SIZE)
+        self._probe_semaphore = asyncio.Semaphore(max(1, SEARCH_MAX_CONCURRENT_PROBES))
         
-        self.incorrect_guesses = set()
-        self._hint_cooldowns = {}
+        self.incorrect_guesses = defaultdict(set)  # channel_id -> incorrect codes of the latest game
         self.hint_cooldown_seconds = 4
+        # channel_id -> last hint time; entries vanish once the cooldown is over
+        self._hint_cooldowns = ExpiringDict(ttl=self.hint_cooldown_seconds, max_size=10000)
         
         self.view_directions = [
             {"heading": 0, "name": "North"},
@@ -114,40 +143,223 @@ class CountryGuesser(commands.Cog, name="CountryGuesser"):
             {"heading": 270, "name": "West"}
         ]
         
+        # World geometries are loaded in the background after the cog registers (see _load_world_data);
+        # until then searches use the bounding-box sampler and the Geocoding API.
+        # Immutable country tables; a reload replaces the snapshot and everything derived from it at once
+        self.country_data = load_country_data()
+        self.guess_resolver = GuessResolver(self.country_data.name_to_code, self.country_data.aliases)
+        self.country_data_watcher = CountryDataWatcher(
+            self.country_data, self._apply_country_data, interval=COUNTRY_DATA_RELOAD_SECONDS
+        )
+
         self.world_gdf = None
-        try:
-            self.world_gdf = gpd.read_file(WORLD_GEOJSON_PATH)
-            print(f"Loaded world GeoJSON data with {len(self.world_gdf)} countries")
-            # Fix a few known ISO_A2 mismatches in the ne_admin_0_map_units_50m.geojson file
-            corrections = {"Norway": "NO", "Réunion": "RE"}
-            for name, correct_iso_a2 in corrections.items():
-                mask = self.world_gdf['NAME'] == name
-                if mask.any():
-                    current_iso_a2 = self.world_gdf.loc[mask, 'ISO_A2'].iloc[0]
-                    if current_iso_a2 != correct_iso_a2:
-                        self.world_gdf.loc[mask, 'ISO_A2'] = correct_iso_a2
-                        print(f"Corrected ISO_A2 for {name} from '{current_iso_a2}' to '{correct_iso_a2}'.")
-                else:
-                    print(f"Warning: '{name}' not found in GeoJSON for ISO_A2 correction.")
+        self.country_resolver = None
+        self.location_sampler = None
+        self.sample_rng = None  # numpy Generator for candidate points; None draws fresh entropy (the benchmarks seed it)
+        self._world_data_task = None
+        self.search_stats = SearchStats(SEARCH_STATS_PATH, max_budget=2 * self.max_retries_location)
+        self.tracer = Tracer(window=TRACE_WINDOW, log_spans=TRACE_LOG_SPANS)
+        self.api_limiter = ApiRateLimiter(
+            GOOGLE_API_RATE_PER_SECOND,
+            GOOGLE_API_BURST,
+            daily_budget=GOOGLE_API_DAILY_BUDGET_USD,
+            background_share=GOOGLE_API_BACKGROUND_BUDGET_SHARE,
+            path=GOOGLE_API_BUDGET_PATH,
+        )
+
+        self.outbound = OutboundSender()
+        self.panorama_cache = ByteLRUCache(PANORAMA_CACHE_MAX_BYTES)
+        self._panorama_tasks = {}  # pano_id -> task building its composite
+        self.map_executor = None  # Worker processes for map rendering, created in cog_load
+        self._map_renders_in_flight = 0
+        # Rendered PNGs keyed by (continent, incorrect guesses in that continent, game status)
+        self.map_cache = ByteLRUCache(MAP_CACHE_MAX_BYTES)
 
+        self.location_store = LocationStore(
+            LOCATION_CACHE_PATH,
+            reuse_interval=LOCATION_CACHE_REUSE_SECONDS,
+            max_serves=LOCATION_CACHE_MAX_SERVES,
+        )
+        self.game_store = GameStore(GAME_STORE_PATH, flush_interval=GAME_STORE_FLUSH_SECONDS)
+        self.shared_state = None
+        if SHARED_STATE_PATH:
+            self.shared_state = SharedState(
+                SHARED_STATE_PATH, f"shards {SHARD_IDS or 'all'}", map_cache_max_bytes=SHARED_MAP_CACHE_MAX_BYTES
+            )
+        self.location_pool = LocationPool(
+            self._find_background_location,
+            self.country_data.codes,
+            low_watermark=LOCATION_POOL_LOW_WATERMARK,
+            high_watermark=LOCATION_POOL_HIGH_WATERMARK,
+        )
 
+    async def cog_load(self):
+        self.http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=GOOGLE_HTTP_MAX_CONNECTIONS,
+                limit_per_host=GOOGLE_HTTP_MAX_CONNECTIONS_PER_HOST,
+                ttl_dns_cache=GOOGLE_HTTP_DNS_CACHE_SECONDS,
+            ),
+            timeout=aiohttp.ClientTimeout(total=GOOGLE_HTTP_TIMEOUT, connect=GOOGLE_HTTP_CONNECT_TIMEOUT),
+        )
+        await asyncio.to_thread(self.search_stats.load)
+        self.save_search_stats.start()
+        await asyncio.to_thread(self.api_limiter.load)
+        self.save_api_budget.start()
+        await self.location_store.open()
+        await self.game_store.open()
+        self._restore_games()
+        if self.shared_state is not None:
+            await self.shared_state.open()
+            self.sync_shared_state.start()
+        self.map_executor = self._start_map_workers()
+        self._world_data_task = asyncio.create_task(self._load_world_data())
+        self.country_data_watcher.start()
+
+    def _start_map_workers(self):
+        # Spawn rather than fork: the bot process already runs threads (location store writer, aiohttp resolver).
+        executor = ProcessPoolExecutor(
+            max_workers=max(1, MAP_RENDER_WORKERS),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=map_render.init_worker,
+            initargs=(WORLD_GEOJSON_PATH, CONTINENTS_PATH),
+        )
+        for _ in range(max(1, MAP_RENDER_WORKERS)):
+            executor.submit(map_render.warm_up)
+        return executor
+
+    async def _apply_country_data(self, data):
+        """Swap in a reloaded CountryData snapshot together with everything derived from it."""
+        if not data.code_to_name:
+            print("Reloaded country data has no countries; keeping the previous tables.")
+            return
+        guess_resolver = await asyncio.to_thread(GuessResolver, data.name_to_code, data.aliases)
+        continents_changed = data.continents != self.country_data.continents
+        # Plain assignments with no await in between: every reader sees either the old or the new tables.
+        self.country_data = data
+        self.guess_resolver = guess_resolver
+        if self.country_resolver is not None:
+            self.country_resolver.country_bounds = data.bounds
+        if self.location_sampler is not None:
+            self.location_sampler.set_country_bounds(data.bounds)
+        self.location_pool.set_countries(data.codes)
+        if continents_changed:
+            # Map workers read continents.json when they start; replace them and drop maps drawn from the old groups.
+            old_executor, self.map_executor = self.map_executor, self._start_map_workers()
+            old_executor.shutdown(wait=False)
+            self.map_cache.clear()
+        print(f"Country data reloaded: {len(data.codes)} countries.")
+
+    def _build_world_data(self, world_path=WORLD_GEOJSON_PATH):
+        world_gdf = load_world_gdf(world_path)
+        country_resolver = CountryResolver(world_gdf, self.country_data.bounds)
+        location_sampler = CountrySampler(world_gdf, self.country_data.bounds)
+        if os.path.exists(COVERAGE_GRID_PATH):
+            try:
+                grid = CoverageGrid.load(COVERAGE_GRID_PATH)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Error loading coverage grid {COVERAGE_GRID_PATH}: {e}. Using the polygon sampler.")
+            else:
+                location_sampler = CoverageSampler(grid, location_sampler)
+                print(f"Loaded Street View coverage for {len(grid.countries)} countries from {COVERAGE_GRID_PATH}.")
+        return world_gdf, country_resolver, location_sampler
+
+    async def _load_world_data(self):
+        """Load the world geometries off the event loop and switch searches to the offline resolver and sampler."""
+        try:
+            self.world_gdf, self.country_resolver, self.location_sampler = await asyncio.to_thread(self._build_world_data)
+            print("Offline country resolver and polygon sampler ready.")
         except Exception as e:
             print(f"Error loading world GeoJSON: {e}")
             print("Map plotting functionality will be unavailable")
+        # Start prefetching only now so background searches get the cheaper offline validation.
+        self.location_pool.start()
+
+    async def cog_unload(self):
+        if self._world_data_task is not None:
+            self._world_data_task.cancel()
+        await self.country_data_watcher.stop()
+        for game in self.games.values():
+            self._release_hint_prefetch(game)
+        await self.location_pool.stop()
+        await self.location_store.close()
+        await self.game_store.close()
+        if self.shared_state is not None:
+            self.sync_shared_state.cancel()
+            await self.shared_state.sync_spend(self.api_limiter.snapshot())
+            await self.shared_state.close()
+        self.save_search_stats.cancel()
+        await asyncio.to_thread(self.search_stats.save, self.search_stats.snapshot())
+        self.save_api_budget.cancel()
+        await asyncio.to_thread(self.api_limiter.save, self.api_limiter.snapshot())
+        await self.http_session.close()
+        await self.outbound.close()
+        self.map_executor.shutdown(wait=False, cancel_futures=True)
+
+    def _restore_games(self):
+        """Resume the games that were in progress when the bot last stopped."""
+        self.incorrect_guesses.update(self.game_store.incorrect_guesses())
+        for row in self.game_store.active_games():
+            if not self._owns_guild(row["guild_id"]):
+                continue  # another shard process resumes it
+            self.games[row["channel_id"]] = {
+                "channel_id": row["channel_id"],
+                "guild_id": row["guild_id"],
+                "country_code": row["country_code"],
+                "country_name": row["country_name"],
+                "pano_id": row["pano_id"],
+                "lat": row["lat"],
+                "lng": row["lng"],
+                "message_id": row["message_id"],
+                "start_time": datetime.datetime.fromtimestamp(row["start_time"], tz=datetime.timezone.utc),
+                "hint_locations": deque(),
+            }
+        if self.games:
+            print(f"Restored {len(self.games)} games in progress.")
+
+    def _owns_guild(self, guild_id):
+        """Whether this process's shards receive the guild's events (always true when not sharded)."""
+        shard_ids = getattr(self.bot, "shard_ids", None)
+        if not shard_ids:
+            return True
+        shard_id = (guild_id >> 22) % self.bot.shard_count if guild_id is not None else 0  # DMs go to shard 0
+        return shard_id in shard_ids
 
-    async def _fetch_url_json(self, url):
-        """Fetch JSON from a URL using a thread executor to avoid blocking."""
+    @tasks.loop(minutes=5)
+    async def save_search_stats(self):
         try:
-            # Ensure timeout is passed as a keyword argument
-            response = await self.bot.loop.run_in_executor(
-                None, lambda: requests.get(url, timeout=10)
-            )
-            response.raise_for_status()  # Raise an exception for HTTP errors
-            return response.json()
-        except requests.exceptions.Timeout:
+            await asyncio.to_thread(self.search_stats.save, self.search_stats.snapshot())
+        except OSError as e:
+            print(f"Error saving search stats: {e}")
+
+    @tasks.loop(minutes=1)
+    async def save_api_budget(self):
+        try:
+            await asyncio.to_thread(self.api_limiter.save, self.api_limiter.snapshot())
+        except OSError as e:
+            print(f"Error saving API budget: {e}")
+
+    @tasks.loop(seconds=SHARED_STATE_SYNC_SECONDS)
+    async def sync_shared_state(self):
+        """Exchange today's API spend with the other shard processes and load the panoramas they cached."""
+        self.api_limiter.shared_spent = await self.shared_state.sync_spend(self.api_limiter.snapshot())
+        await self.location_store.refresh()
+
+    async def _fetch_url_json(self, url, endpoint):
+        """Fetch JSON from a URL over the cog's pooled keep-alive HTTP session, within the shared rate limit."""
+        try:
+            await self.api_limiter.acquire(endpoint)
+            with metrics.GOOGLE_API_SECONDS.labels(endpoint).time():
+                async with self.http_session.get(url) as response:
+                    response.raise_for_status()  # Raise an exception for HTTP errors
+                    return await response.json(content_type=None)
+        except BudgetExhausted as e:
+            print(f"Skipping {endpoint} request: {e}")
+            return None
+        except asyncio.TimeoutError:
             print(f"Request timed out: {url}")
             return None
-        except requests.exceptions.RequestException as e:
+        except aiohttp.ClientError as e:
             print(f"API request failed: {e}")
             return None
         except ValueError as e: # Handles JSON decoding errors
@@ -159,98 +371,257 @@ class CountryGuesser(commands.Cog, name="CountryGuesser"):
         urls = []
         for direction in self.view_directions:
             url = (
-                f"https://maps.googleapis.com/maps/api/streetview?"
+                f"{GOOGLE_API_BASE_URL}/maps/api/streetview?"
                 f"size=1200x675&pano={pano_id}&heading={direction['heading']}&key={GOOGLE_MAPS_API_KEY}"
             )
             urls.append({"url": url, "name": direction["name"]})
         return urls
         
+    async def _build_panorama_image(self, pano_id):
+        view_urls = self._get_street_view_image_urls(pano_id)
+        images = await asyncio.gather(*(fetch_image(self.http_session, view["url"], self.api_limiter) for view in view_urls))
+        if not all(images):
+            return None
+        try:
+            image_bytes = await asyncio.to_thread(compose_grid, images, [view["name"] for view in view_urls])
+        except (OSError, ValueError) as e:  # PIL raises these for undecodable images
+            print(f"Failed to compose panorama image for {pano_id}: {e}")
+            return None
+        self.panorama_cache.put(pano_id, image_bytes)
+        return image_bytes
+
+    async def _get_panorama_image(self, pano_id):
+        """Return the 2x2 four-direction JPEG for a panorama, fetching and stitching it on first use."""
+        image_bytes = self.panorama_cache.get(pano_id)
+        if image_bytes is not None:
+            return image_bytes
+        task = self._panorama_tasks.get(pano_id)
+        if task is None:
+            task = asyncio.create_task(self._build_panorama_image(pano_id))
+            self._panorama_tasks[pano_id] = task
+            task.add_done_callback(lambda _: self._panorama_tasks.pop(pano_id, None))
+        return await asyncio.shield(task)
+
+    async def _attach_panorama(self, embed, pano_id):
+        """Point the embed at an uploaded panorama composite; returns the discord.File, or None to fall back to URLs."""
+        with self.tracer.span("panorama", pano_id=pano_id) as span:
+            image_bytes = await self._get_panorama_image(pano_id)
+            span.set(available=image_bytes is not None)
+        if image_bytes is None:
+            return None
+        embed.set_image(url="attachment://panorama.jpg")
+        return discord.File(io.BytesIO(image_bytes), filename="panorama.jpg")
+
+    async def _send_result_embed(self, channel, embed, pano_id):
+        """Send a game-over embed with the panorama composite, or else a Static API image while the budget allows."""
+        panorama_file = await self._attach_panorama(embed, pano_id)
+        if panorama_file:
+            await self.outbound.send(channel, embed=embed, file=panorama_file, priority=PRIORITY_RESULT)
+            return
+        # Discord fetches the Static API image for us, so it is only linked while the budget allows
+        if self.api_limiter.charge("streetview_image"):
+            street_view_image_url = (
+                f"{GOOGLE_API_BASE_URL}/maps/api/streetview?"
+                f"size=600x400&pano={pano_id}&heading=0&key={GOOGLE_MAPS_API_KEY}"
+            )
+            embed.set_image(url=street_view_image_url)
+        await self.outbound.send(channel, embed=embed, priority=PRIORITY_RESULT)
+
+    async def _is_in_country(self, lat, lng, country_code):
+        """Check whether a point lies in the country: True, False, or None if it could not be determined."""
+        if self.country_resolver is not None:
+            in_country = self.country_resolver.match(lat, lng, country_code)
+            if in_country is not None or not REMOTE_GEOCODE_FALLBACK:
+                return in_country
+
+        geocode_url = (
+            f"{GOOGLE_API_BASE_URL}/maps/api/geocode/json?"
+            f"latlng={lat},{lng}&key={GOOGLE_MAPS_API_KEY}"
+        )
+        geocode_data = await self._fetch_url_json(geocode_url, "geocode")
+        if geocode_data and geocode_data.get("status") == "OK" and geocode_data.get("results"):
+            for component in geocode_data["results"][0].get("address_components", []):
+                if "country" in component.get("types", []):
+                    return component.get("short_name", "").lower() == country_code.lower()
+        return None
+
+    async def _probe_candidate(self, country_code, country_name, sampler, attempt, lat, lng, radius):
+        """Look for a panorama near one candidate point and validate its country."""
+        with self.tracer.span("probe", country=country_code, attempt=attempt + 1, radius=radius, sampler=sampler) as span:
+            location_data, outcome = await self._run_probe(country_code, country_name, sampler, attempt, lat, lng, radius)
+            span.set(outcome=outcome)
+        return location_data
+
+    async def _run_probe(self, country_code, country_name, sampler, attempt, lat, lng, radius):
+        metadata_url = (
+            f"{GOOGLE_API_BASE_URL}/maps/api/streetview/metadata?"
+            f"location={lat},{lng}&radius={radius}&source=outdoor&key={GOOGLE_MAPS_API_KEY}"
+        )
+
+        async with self._probe_semaphore:
+            with self.tracer.span("metadata", attempt=attempt + 1, radius=radius):
+                metadata = await self._fetch_url_json(metadata_url, "streetview_metadata")
+
+            if not (metadata and metadata.get("status") == "OK" and metadata.get("pano_id")):
+                self.search_stats.record_probe(country_code, sampler, radius, "no_pano")
+                metrics.SEARCH_PROBES.labels("no_pano").inc()
+                return None, "no_pano"
+
+            pano_id = metadata["pano_id"]
+            actual_lat = metadata["location"]["lat"]
+            actual_lng = metadata["location"]["lng"]
+
+            print(f"Attempt {attempt + 1}: Found Street View at {actual_lat}, {actual_lng} with radius {radius}.")
+            with self.tracer.span("validation", attempt=attempt + 1, radius=radius):
+                in_country = await self._is_in_country(actual_lat, actual_lng, country_code)
+
+        outcome = {True: "hit", False: "wrong_country", None: "unknown"}[in_country]
+        self.search_stats.record_probe(country_code, sampler, radius, outcome)
+        metrics.SEARCH_PROBES.labels(outcome).inc()
+        if in_country:
+            print(f"Found valid Street View in {country_name} at {actual_lat}, {actual_lng} with radius {radius}.")
+            location_data = {
+                "pano_id": pano_id,
+                "country_code": country_code.lower(),
+                "country_name": country_name,
+                "lat": actual_lat,
+                "lng": actual_lng,
+            }
+            self.location_store.add(location_data)
+            return location_data, outcome
+        if in_country is False:
+            print(
+                f"Found Street View at {actual_lat}, {actual_lng} (radius {radius}) "
+                f"but it is not in {country_code}."
+            )
+        return None, outcome
+
+    async def _first_probe_result(self, probes):
+        """Return the first validated location from concurrent probes and cancel the rest."""
+        winner = None
+        try:
+            for finished in asyncio.as_completed(probes):
+                winner = await finished
+                if winner:
+                    return winner
+            return None
+        finally:
+            for probe in probes:
+                if not probe.done():
+                    probe.cancel()
+                elif not probe.cancelled() and probe.exception() is None and probe.result() not in (None, winner):
+                    # A second probe also succeeded; keep it for a later game instead of wasting it.
+                    self.location_pool.put(probe.result())
+            await asyncio.gather(*probes, return_exceptions=True)
+
     async def _get_street_view_in_country(self, country_code):
         """Find a random Street View location within the given country."""
         if not GOOGLE_MAPS_API_KEY:
             print("Error: GOOGLE_MAPS_API_KEY is not set.")
             return None
             
-        country_name = COUNTRY_CODE_TO_NAME.get(country_code.lower(), country_code)
-        
-        default_bounds = [-90, -180, 90, 180]
+        country_data = self.country_data  # one snapshot for the whole search, even if a reload lands meanwhile
+        country_name = country_data.code_to_name.get(country_code.lower(), country_code)
         
-        bounds = COUNTRY_BOUNDS.get(country_code.lower(), default_bounds)
-        south, west, north, east = bounds
+        default_bounds = (-90, -180, 90, 180)
         
-        print(f"Searching for Street View in {country_name} within bounds: {bounds}")
+        bounds = country_data.bounds.get(country_code.lower(), default_bounds)
         
-        radii = [1000, 10000, 100000, 1000000]
+        # Radii that have worked best for this country come first; hard countries get a bigger budget
+        radii = self.search_stats.radius_order(country_code, SEARCH_RADII)
+        max_attempts = self.search_stats.attempt_budget(country_code, self.max_retries_location)
 
-        for attempt in range(self.max_retries_location):
-            lat = random.uniform(south, north)
-            lng = random.uniform(west, east)
-            
-            # Cycle through radii based on attempt number
-            radius = radii[attempt % len(radii)]
-            metadata_url = (
-                f"https://maps.googleapis.com/maps/api/streetview/metadata?"
-                f"location={lat},{lng}&radius={radius}&source=outdoor&key={GOOGLE_MAPS_API_KEY}"
-            )
-            
-            metadata = await self._fetch_url_json(metadata_url)
-            
-            if metadata and metadata.get("status") == "OK" and metadata.get("pano_id"):
-                pano_id = metadata["pano_id"]
-                actual_lat = metadata["location"]["lat"]
-                actual_lng = metadata["location"]["lng"]
-                
-                geocode_url = (
-                    f"https://maps.googleapis.com/maps/api/geocode/json?"
-                    f"latlng={actual_lat},{actual_lng}&key={GOOGLE_MAPS_API_KEY}"
-                )
-                geocode_data = await self._fetch_url_json(geocode_url)
-
-                print(f"Attempt {attempt + 1}: Found Street View at {actual_lat}, {actual_lng} with radius {radius}.")
-                if geocode_data and geocode_data.get("status") == "OK" and geocode_data.get("results"):
-                    for component in geocode_data["results"][0].get("address_components", []):
-                        if "country" in component.get("types", []):
-                            found_country_code = component.get("short_name", "").lower()
-                            if found_country_code == country_code.lower():
-                                print(f"Found valid Street View in {country_name} at {actual_lat}, {actual_lng} with radius {radius}.")
-                                return {
-                                    "pano_id": pano_id,
-                                    "country_code": country_code.lower(),
-                                    "country_name": country_name,
-                                    "lat": actual_lat,
-                                    "lng": actual_lng,
-                                }
-                            else:
-                                print(
-                                    f"Found Street View at {actual_lat}, {actual_lng} (radius {radius}) "
-                                    f"but country code {found_country_code} != {country_code}."
-                                )
-            await asyncio.sleep(0.1)  # Small delay between attempts
-        
-        print(f"Failed to find a suitable Street View location in {country_name} after {self.max_retries_location} attempts.")
+        candidates = None
+        if self.location_sampler is not None and random.random() >= BBOX_SAMPLER_SHARE:
+            candidates = self.location_sampler.sample(country_code, max_attempts, rng=self.sample_rng)
+            sampler = self.location_sampler.label(country_code)
+        if candidates is None:
+            candidates = sample_in_bounds(bounds, max_attempts, rng=self.sample_rng)
+            sampler = "bbox"
+
+        print(f"Searching for Street View in {country_name} ({sampler} sampler, bounds: {bounds}, radii: {radii}, budget: {max_attempts})")
+
+        if self.probe_batch_size == 1:
+            for attempt, (lat, lng) in enumerate(candidates):
+                # Cycle through radii based on attempt number
+                radius = radii[attempt % len(radii)]
+                location_data = await self._probe_candidate(country_code, country_name, sampler, attempt, lat, lng, radius)
+                if location_data:
+                    self.search_stats.record_search(country_code, True)
+                    return location_data
+                with self.tracer.span("backoff", attempt=attempt + 1):
+                    await asyncio.sleep(0.1)  # Small delay between attempts
+        else:
+            for wave_start in range(0, len(candidates), self.probe_batch_size):
+                wave = [
+                    asyncio.create_task(
+                        self._probe_candidate(country_code, country_name, sampler, attempt, lat, lng, radii[attempt % len(radii)])
+                    )
+                    for attempt, (lat, lng) in enumerate(candidates[wave_start:wave_start + self.probe_batch_size], start=wave_start)
+                ]
+                location_data = await self._first_probe_result(wave)
+                if location_data:
+                    self.search_stats.record_search(country_code, True)
+                    return location_data
+
+        self.search_stats.record_search(country_code, False)
+        print(f"Failed to find a suitable Street View location in {country_name} after {max_attempts} attempts.")
         return None
 
+    async def _find_fresh_location(self, country_code):
+        """Serve a cached location that is due for reuse, otherwise search live."""
+        location_data = self.location_store.take(country_code)
+        if not location_data and self.api_limiter.budget_exhausted():
+            # Over today's API budget: replay a cached panorama early instead of searching live
+            if current_priority() == PRIORITY_USER:
+                location_data = self.location_store.take(country_code, ignore_reuse_interval=True)
+            if not location_data:
+                return None
+        if location_data:
+            location_data["country_name"] = self.country_data.code_to_name.get(location_data["country_code"], country_code)
+            return location_data
+        return await self._get_street_view_in_country(country_code)
+
+    async def _find_background_location(self, country_code):
+        """Pool refill finder: the same lookup, with its API calls queued behind players' ones."""
+        with background_priority():
+            return await self._find_fresh_location(country_code)
+
+    async def _find_location(self, country_code):
+        """Return a pooled location for the country, falling back to the cache and a live search."""
+        with self.tracer.span("find_location", country=country_code) as span:
+            location_data = self.location_pool.take(country_code)
+            if location_data:
+                span.set(source="pool")
+                return location_data
+            location_data = await self._find_fresh_location(country_code)
+            span.set(source="store_or_search", found=bool(location_data))
+            return location_data
+
+    @contextlib.asynccontextmanager
+    async def _search_slot(self, guild_id):
+        """Hold one of the guild's search slots and one of the global ones."""
+        async with self._guild_search_semaphores[guild_id]:
+            async with self._search_semaphore:
+                yield
+
     async def _process_guess(self, channel: discord.TextChannel, author: discord.User, original_message: discord.Message, guess_input: str):
         """Process a guess, react, and end the game if correct."""
-        normalized_guess = guess_input.strip().lower()
-        if not self.current_game:
+        game = self.games.get(channel.id)
+        if not game:
             await channel.send("Error: No game active to process guess for.", delete_after=10)
             return
 
-        correct_code = self.current_game["country_code"]
-        correct_name = self.current_game["country_name"]
+        correct_code = game["country_code"]
+        correct_name = game["country_name"]
         
-        guessed_code = None
-
-        if len(normalized_guess) == 2 and normalized_guess.isalpha():
-            guessed_code = normalized_guess
-        elif normalized_guess in COUNTRY_NAME_TO_CODE:
-            guessed_code = COUNTRY_NAME_TO_CODE[normalized_guess]
-        else:
+        # Names, aliases, ISO2/ISO3 codes and small typos; anything else is ordinary chat
+        guessed_code = self.guess_resolver.resolve(guess_input)
+        if guessed_code is None:
             return
 
         # Add country flag reaction
-        if guessed_code and len(guessed_code) == 2 and guessed_code.isalpha():
+        if len(guessed_code) == 2 and guessed_code.isalpha():
             try:
                 flag_emoji = "".join(chr(ord(char.upper()) - ord('A') + 0x1F1E6) for char in guessed_code)
                 await original_message.add_reaction(flag_emoji)
@@ -260,6 +631,18 @@ class CountryGuesser(commands.Cog, name="CountryGuesser"):
                 print(f"Failed to add flag reaction: {e}")
 
         if guessed_code == correct_code:
+            if self.games.get(channel.id) is not game:
+                return  # Someone else already won this game
+            del self.games[channel.id]  # End the game
+            self._release_hint_prefetch(game)
+            self.incorrect_guesses.pop(channel.id, None)
+            self.game_store.end_game(channel.id)
+            self.game_store.set_incorrect_guesses(channel.id, ())
+            guess_seconds = (discord.utils.utcnow() - game["start_time"]).total_seconds()
+            winner_stats = None
+            if game.get("guild_id") is not None:
+                winner_stats = self.game_store.record_win(game["guild_id"], author.id, guess_seconds)
+
             try:
                 await original_message.add_reaction('✅') # Add tick for correct guess
             except discord.Forbidden:
@@ -268,12 +651,7 @@ class CountryGuesser(commands.Cog, name="CountryGuesser"):
                 print(f"Failed to add reaction: {e}")
 
             winner = author
-            street_view_image_url = (
-                f"https://maps.googleapis.com/maps/api/streetview?"
-                f"size=600x400&pano={self.current_game['pano_id']}&heading=0&key={GOOGLE_MAPS_API_KEY}"
-            )
-            
-            map_link = f"https://www.google.com/maps/@?api=1&map_action=pano&pano={self.current_game['pano_id']}"
+            map_link = f"https://www.google.com/maps/@?api=1&map_action=pano&pano={game['pano_id']}"
             
             embed = discord.Embed(
                 title="🎉 Correct Guess! 🎉",
@@ -281,12 +659,14 @@ class CountryGuesser(commands.Cog, name="CountryGuesser"):
                 color=discord.Color.green()
             )
             embed.add_field(name="Location", value=f"[View on Google Maps]({map_link})")
-            embed.set_image(url=street_view_image_url)
+            embed.add_field(name="Time", value=f"{guess_seconds:.1f}s")
+            if winner_stats:
+                embed.add_field(name="Wins", value=str(winner_stats["wins"]))
+                if winner_stats["current_streak"] > 1:
+                    embed.add_field(name="Streak", value=f"🔥 {winner_stats['current_streak']}")
             embed.set_footer(text="Game Over!")
-            await channel.send(embed=embed)
-            
-            self.incorrect_guesses = set()
-            self.current_game = None  # End the game
+            with self.tracer.span("send", kind="result", country=correct_code):
+                await self._send_result_embed(channel, embed, game['pano_id'])
         else:
             try:
                 await original_message.add_reaction('❌') # Add cross for incorrect guess
@@ -296,15 +676,16 @@ class CountryGuesser(commands.Cog, name="CountryGuesser"):
                 print(f"Failed to add reaction: {e}")
             
             # Add to incorrect guesses set
-            if guessed_code:
-                self.incorrect_guesses.add(guessed_code)
+            if guessed_code and self.games.get(channel.id) is game and guessed_code not in self.incorrect_guesses[channel.id]:
+                self.incorrect_guesses[channel.id].add(guessed_code)
+                self.game_store.set_incorrect_guesses(channel.id, self.incorrect_guesses[channel.id])
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
         if message.author.bot:
             return
 
-        if not self.current_game or self.current_game['channel_id'] != message.channel.id:
+        if message.channel.id not in self.games:
             return
 
         # Plain 'hint' (no prefix) during an active game
@@ -320,20 +701,23 @@ class CountryGuesser(commands.Cog, name="CountryGuesser"):
     @commands.command(name="stop_g", help="Stops the current guessing game in this channel (requires manage_messages).")
     @commands.has_permissions(manage_messages=True)
     async def stop_guessing_game(self, ctx):
-        if self.current_game and self.current_game['channel_id'] == ctx.channel.id:
-            game_start_time = self.current_game.get('start_time')
+        game = self.games.get(ctx.channel.id)
+        if game:
+            game_start_time = game.get('start_time')
             if not game_start_time or (discord.utils.utcnow() - game_start_time).total_seconds() < 60:
                 await ctx.send("The game cannot be stopped until at least 1 minute has passed since it started.", delete_after=10)
                 return
 
-            pano_id = self.current_game['pano_id']
-            country_code = self.current_game['country_code'].upper()
-            country_name = self.current_game['country_name']
-            
-            street_view_image_url = (
-                f"https://maps.googleapis.com/maps/api/streetview?"
-                f"size=600x400&pano={pano_id}&heading=0&key={GOOGLE_MAPS_API_KEY}"
-            )
+            if self.games.get(ctx.channel.id) is game:
+                del self.games[ctx.channel.id]
+                self._release_hint_prefetch(game)
+                self.game_store.end_game(ctx.channel.id)
+                if game.get("guild_id") is not None:
+                    self.game_store.record_no_winner(game["guild_id"])
+
+            pano_id = game['pano_id']
+            country_code = game['country_code'].upper()
+            country_name = game['country_name']
             
             map_link = f"https://www.google.com/maps/@?api=1&map_action=pano&pano={pano_id}"
             
@@ -353,11 +737,7 @@ class CountryGuesser(commands.Cog, name="CountryGuesser"):
                 value=f"[View on Google Maps]({map_link})"
             )
             
-            embed.set_image(url=street_view_image_url)
-            
-            await ctx.send(embed=embed)
-                
-            self.current_game = None
+            await self._send_result_embed(ctx.channel, embed, pano_id)
         else:
             await ctx.send("No game is currently active in this channel to stop.")
             
@@ -377,44 +757,62 @@ class CountryGuesser(commands.Cog, name="CountryGuesser"):
             return
             
 
-        if self.current_game:
-            if self.current_game['channel_id'] == ctx.channel.id:
-                await ctx.send("A game is already in progress in this channel! Use `<country_code>` or the country name to guess.")
-            else:
-                other_channel = self.bot.get_channel(self.current_game['channel_id'])
-                await ctx.send(f"A game is already in progress in another channel ({other_channel.mention if other_channel else 'unknown channel'}). Please wait.")
+        if ctx.channel.id in self.games:
+            await ctx.send("A game is already in progress in this channel! Use `<country_code>` or the country name to guess.")
             return
-
-        msg = await ctx.send("🌍 Starting a new game... Choosing a country and finding a location, this might take a moment...")
-        
-        self.incorrect_guesses = set()
-        
-        if not COUNTRY_CODE_TO_NAME:
-            await msg.edit(content="Error: Country data is not loaded. Cannot start the game.")
+        if ctx.channel.id in self._starting_channels:
+            await ctx.send("A game is already being started in this channel. Please wait.", delete_after=10)
             return
-            
-        chosen_country_code = random.choice(list(COUNTRY_CODE_TO_NAME.keys()))
-        chosen_country_name = COUNTRY_CODE_TO_NAME[chosen_country_code]
-        
-        location_data = await self._get_street_view_in_country(chosen_country_code)
+
+        with self.tracer.trace("game_start", channel_id=ctx.channel.id) as trace:
+            await self._start_game_impl(ctx, trace)
+
+    async def _start_game_impl(self, ctx, trace):
+        self._starting_channels.add(ctx.channel.id)
+        try:
+            with self.tracer.span("send", kind="status"):
+                msg = await ctx.send("🌍 Starting a new game... Choosing a country and finding a location, this might take a moment...")
+
+            country_data = self.country_data
+            if not country_data.codes:
+                await msg.edit(content="Error: Country data is not loaded. Cannot start the game.")
+                return
+
+            with self.tracer.span("choose_country") as span:
+                chosen_country_code = random.choice(country_data.codes)
+                chosen_country_name = country_data.code_to_name[chosen_country_code]
+                span.set(country=chosen_country_code)
+            trace.set(country=chosen_country_code)
+
+            async with self._search_slot(ctx.guild.id if ctx.guild else None):
+                location_data = await self._find_location(chosen_country_code)
+        finally:
+            self._starting_channels.discard(ctx.channel.id)
 
         if not location_data:
+            trace.set(found=False)
             await msg.edit(content=f"Could not find a suitable Street View location in {chosen_country_name} after several attempts. Please try again later.")
             return
 
-        self.current_game = {
+        self.incorrect_guesses[ctx.channel.id] = set()
+        self.games[ctx.channel.id] = {
             "channel_id": ctx.channel.id,
+            "guild_id": ctx.guild.id if ctx.guild else None,
             "country_code": location_data["country_code"],
             "country_name": location_data["country_name"],
             "pano_id": location_data["pano_id"],
             "lat": location_data["lat"],
             "lng": location_data["lng"],
-            "message": msg,
-            "start_time": discord.utils.utcnow()
+            "message_id": msg.id,
+            "start_time": discord.utils.utcnow(),
+            "hint_locations": deque(),  # prefetched, not yet shown
         }
+        game = self.games[ctx.channel.id]
+        self.game_store.save_game(game)
+        self._start_hint_prefetch(game)
+        self.game_store.set_incorrect_guesses(ctx.channel.id, ())
+        metrics.GAME_STARTS.inc()
 
-        view_urls = self._get_street_view_image_urls(location_data['pano_id'])
-        
         embed = discord.Embed(
             title="🌍 Guess the Location! 🌍",
             description="I've picked a location from one of the chosen countries. Can you guess which **country**?",
@@ -427,158 +825,123 @@ class CountryGuesser(commands.Cog, name="CountryGuesser"):
             inline=False
         )
         
+        panorama_file = await self._attach_panorama(embed, location_data['pano_id'])
+        if panorama_file:
+            embed.set_footer(text="360° view mode - North, East, South and West in one image")
+            with self.tracer.span("send", kind="game"):
+                await msg.edit(content=None, embed=embed, attachments=[panorama_file])
+            return
+
+        # Fall back to linking the four Static API images directly; Discord fetches them for us
+        view_urls = self._get_street_view_image_urls(location_data['pano_id'])
+        if not self.api_limiter.charge("streetview_image", len(view_urls)):
+            # Over today's API budget and the composite is not cached: the game cannot be shown.
+            if self.games.get(ctx.channel.id) is game:
+                del self.games[ctx.channel.id]
+                self._release_hint_prefetch(game)
+                self.game_store.end_game(ctx.channel.id)
+            self.location_pool.put(location_data)
+            trace.set(found=False)
+            await msg.edit(content="Today's Street View image budget is used up. Please try again later.")
+            return
         embed.set_image(url=view_urls[0]["url"])
         embed.set_footer(text="360° view mode - Look at all 4 directions to help identify the location")
-        
-        await msg.edit(content=None, embed=embed)
-        
+
+        embeds = [embed]
         for i in range(1, 4):  # Skip the first one since it's in the main embed
             direction_embed = discord.Embed(
                 title=f"View facing {view_urls[i]['name']}",
                 color=discord.Color.blue()
             )
             direction_embed.set_image(url=view_urls[i]["url"])
-            await ctx.send(embed=direction_embed)
+            embeds.append(direction_embed)
+
+        # All four views go out in a single edit instead of one edit plus three sends
+        with self.tracer.span("send", kind="game"):
+            await msg.edit(content=None, embeds=embeds)
+
+
+    def _continent_country_codes(self, continent_key):
+        return self.country_data.continent(map_render.CONTINENTS[continent_key][0])
 
+    def _on_map_render_done(self, _future):
+        self._map_renders_in_flight -= 1
+
+    async def _show_continent_map(self, ctx, continent_key: str):
+        """Render a choropleth map for a continent in a worker process, highlighting incorrect guesses."""
+        continent_name_display = map_render.CONTINENTS[continent_key][1]
+        specific_country_codes = self._continent_country_codes(continent_key)
 
-    async def _show_continent_map(self, ctx, continent_name_display: str, specific_country_codes: list, plotly_map_scope: str, auto_fit_bounds: bool = False):
-        """Render a choropleth map for a continent, highlighting incorrect guesses."""
         if self.world_gdf is None:
-            await ctx.send("Sorry, the world map data couldn't be loaded. Map visualization is unavailable.")
+            if self._world_data_task is not None and not self._world_data_task.done():
+                await ctx.send("The world map data is still loading. Please try again in a few seconds.", delete_after=10)
+            else:
+                await ctx.send("Sorry, the world map data couldn't be loaded. Map visualization is unavailable.")
             return
 
         if not specific_country_codes:
             await ctx.send(f"No country data loaded for {continent_name_display}. Cannot generate map.")
             return
 
-        continent_gdf = self.world_gdf.copy()
-        
-        continent_gdf = continent_gdf[continent_gdf['ISO_A2'].str.lower().isin(specific_country_codes)]
+        incorrect_guesses = self.incorrect_guesses.get(ctx.channel.id, set())
+        continent_incorrect_guesses = frozenset(code for code in incorrect_guesses if code in specific_country_codes)
 
-        if continent_gdf.empty:
-            await ctx.send(f"No map data found for countries listed under {continent_name_display}. "
-                           f"Ensure `continents.json` and GeoJSON data are correct and include these countries.")
-            return
-        
-        def get_country_status(country_code_iso_a2):
-            code_lower = country_code_iso_a2.lower()
-            if code_lower in self.incorrect_guesses:
-                return "Incorrect Guess"
-            else:
-                return "Not Guessed"
-                
-        continent_gdf['status'] = continent_gdf['ISO_A2'].apply(get_country_status)
-        
-        map_title = f"{continent_name_display} Map"
-        
-        fig = px.choropleth(
-            continent_gdf,
-            geojson=continent_gdf.geometry,
-            locations=continent_gdf.index, # Use GeoDataFrame index
-            color='status',
-            color_discrete_map={
-                'Incorrect Guess': '#FF4757', # Modern red
-                'Not Guessed': '#57606F'       # Sophisticated dark gray
-            },
-            scope=plotly_map_scope,
-            labels={'status': 'Country Status'},
-            title=map_title
-        )
-        
-        fig.update_geos(
-            showcoastlines=True,
-            coastlinecolor="#2C3E50",
-            coastlinewidth=1.5,
-            showland=True,
-            landcolor="#ECEFF1",
-            showocean=True,
-            oceancolor="#E3F2FD",
-            showlakes=True,
-            lakecolor="#E1F5FE",
-            showrivers=True,
-            rivercolor="#81D4FA",
-            riverwidth=0.5,
-            showcountries=True,
-            countrycolor="#BDBDBD",
-            countrywidth=0.8,
-            projection_type="natural earth"
-        )
-
-        if auto_fit_bounds and plotly_map_scope == "world":
-            fig.update_geos(fitbounds="locations", visible=True)
-        
-        fig.update_layout(
-            height=900,
-            width=1200,
-            margin={"r":20,"t":80,"l":20,"b":20},
-            title={
-                'text': map_title,
-                'x': 0.5,
-                'xanchor': 'center',
-                'font': {
-                    'size': 24,
-                    'family': 'Arial, sans-serif',
-                    'color': '#2C3E50'
-                }
-            },
-            font=dict(
-                family="Arial, sans-serif",
-                size=14,
-                color="#2C3E50"
-            ),
-            paper_bgcolor="#FAFAFA",
-            plot_bgcolor="#FAFAFA",
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=-0.1,
-                xanchor="center",
-                x=0.5,
-                bgcolor="rgba(255,255,255,0.8)",
-                bordercolor="#BDBDBD",
-                borderwidth=1,
-                font=dict(size=12)
-            )
-        )
-        
         game_status_text = "No active game"
-        if self.current_game:
+        if ctx.channel.id in self.games:
             game_status_text = "Game in progress"
-        
+
         total_continent_countries = len(specific_country_codes)
-        continent_incorrect_guesses = {code for code in self.incorrect_guesses if code in specific_country_codes}
         not_guessed_count = total_continent_countries - len(continent_incorrect_guesses)
-        
+
         footer_text_status = f"Status: {game_status_text} - {not_guessed_count}/{total_continent_countries} countries in {continent_name_display} not guessed"
-        
-        fig.update_layout(
-            annotations=[
-                dict(
-                    x=0.02,
-                    y=0.02,
-                    xref="paper",
-                    yref="paper",
-                    text=f"<b style='color:#2C3E50;'>{footer_text_status}</b>",
-                    showarrow=False,
-                    font=dict(
-                        size=16,
-                        family="Arial, sans-serif",
-                        color="#2C3E50"
-                    ),
-                    bgcolor="rgba(255,255,255,0.9)",
-                    bordercolor="#BDBDBD",
-                    borderwidth=1,
-                    borderpad=8
-                )
-            ]
-        )
-        
-        img_bytes = io.BytesIO()
-        pio.write_image(fig, img_bytes, format="png", width=1200, height=900, scale=2)
-        img_bytes.seek(0)
-        
-        discord_file = discord.File(img_bytes, filename=f"{continent_name_display.lower().replace(' ', '_')}_map.png")
-        
+
+        cache_key = (continent_key, continent_incorrect_guesses, game_status_text)
+        png_bytes = self.map_cache.get(cache_key)
+        shared_key = None
+        if self.shared_state is not None:
+            # Maps drawn by any shard process; the data signature keeps maps of older continent groups out.
+            # Not hash(): it can differ between processes (e.g. for None before Python 3.12).
+            codes = ",".join(sorted(continent_incorrect_guesses))
+            data_digest = hashlib.sha1(repr(self.country_data.signature).encode()).hexdigest()[:16]
+            shared_key = f"{data_digest}:{continent_key}:{game_status_text}:{codes}"
+            if png_bytes is None:
+                png_bytes = await self.shared_state.get_map(shared_key)
+                if png_bytes is not None:
+                    self.map_cache.put(cache_key, png_bytes)
+        rendered = False
+        if png_bytes is None:
+            if self._map_renders_in_flight >= MAP_RENDER_MAX_QUEUE:
+                await ctx.send("The map renderer is busy right now. Please try again in a moment.", delete_after=10)
+                return
+
+            loop = asyncio.get_running_loop()
+            render_started = time.perf_counter()
+            self._map_renders_in_flight += 1
+            render_future = self.map_executor.submit(
+                map_render.render_continent_map, continent_key, continent_incorrect_guesses, footer_text_status
+            )
+            render_future.add_done_callback(
+                lambda future: loop.call_soon_threadsafe(self._on_map_render_done, future)
+            )
+            try:
+                png_bytes = await asyncio.wait_for(asyncio.wrap_future(render_future), timeout=MAP_RENDER_TIMEOUT)
+            except asyncio.TimeoutError:
+                await ctx.send(f"Rendering the {continent_name_display} map took too long. Please try again later.", delete_after=10)
+                return
+            except map_render.MapRenderError as e:
+                await ctx.send(str(e))
+                return
+            except Exception as e:
+                print(f"Error rendering {continent_name_display} map: {e}")
+                await ctx.send("An error occurred while rendering the map.", delete_after=10)
+                return
+            metrics.MAP_RENDER_SECONDS.observe(time.perf_counter() - render_started)
+            self.map_cache.put(cache_key, png_bytes)
+            rendered = True
+
+        map_title = f"{continent_name_display} Map"
+        discord_file = discord.File(io.BytesIO(png_bytes), filename=f"{continent_name_display.lower().replace(' ', '_')}_map.png")
+
         embed = discord.Embed(
             title=f"🗺️ {map_title}",
             description="🔴 Incorrect guesses • ⚫ Not yet guessed\n*Map of your guessing progress*",
@@ -586,8 +949,10 @@ class CountryGuesser(commands.Cog, name="CountryGuesser"):
         )
         embed.set_image(url=f"attachment://{discord_file.filename}")
         embed.set_footer(text=f"🎯 {footer_text_status}")
-        
+
         await ctx.send(file=discord_file, embed=embed)
+        if rendered and shared_key is not None:
+            await self.shared_state.put_map(shared_key, png_bytes)
 
 
     async def _send_hint_impl(self, channel: discord.TextChannel):
@@ -601,23 +966,101 @@ class CountryGuesser(commands.Cog, name="CountryGuesser"):
                 await channel.send(f"Hint is on cooldown. Try again in {int(remaining)}s.", delete_after=5)
                 return
 
-        if not self.current_game or self.current_game['channel_id'] != channel.id:
+        game = self.games.get(channel.id)
+        if not game:
             await channel.send("No active game. Start one with `!g`.", delete_after=10)
             return
 
         # Record cooldown time
         self._hint_cooldowns[channel.id] = now
 
-        new_location_data = await self._get_street_view_in_country(self.current_game["country_code"]) 
+        with self.tracer.trace("hint", channel_id=channel.id, country=game["country_code"]):
+            await self._deliver_hint(channel, game)
+
+    def _start_hint_prefetch(self, game):
+        """Fetch the game's next hint locations in the background, queued behind players' API calls."""
+        if HINT_PREFETCH_COUNT <= 0:
+            return
+        task = game.get("hint_prefetch")
+        if task is None or task.done():
+            game["hint_prefetch"] = asyncio.create_task(self._prefetch_hints(game))
+
+    async def _prefetch_hints(self, game):
+        hints = game["hint_locations"]
+        failures = 0
+        while len(hints) < HINT_PREFETCH_COUNT and failures < 2:
+            try:
+                # Same caps as players' searches, so each active game cannot add an uncapped one.
+                async with self._search_slot(game.get("guild_id")):
+                    location_data = await self._find_background_location(game["country_code"])
+            except Exception as e:
+                print(f"Hint prefetch failed for {game['country_code']}: {e}")
+                return
+            if self.games.get(game["channel_id"]) is not game:
+                # The game ended while we were searching; keep the location for a later game.
+                if location_data:
+                    self.location_pool.put(location_data)
+                return
+            if not location_data or location_data["pano_id"] == game["pano_id"] or any(
+                hint["pano_id"] == location_data["pano_id"] for hint in hints
+            ):
+                failures += 1
+                continue
+            hints.append(location_data)
+            if HINT_PREFETCH_COMPOSITE and len(hints) == 1:
+                # Stitch the next hint's composite now too, so showing it is a cache hit; the rest are
+                # left to the hint itself, as every composite is four paid Static API images.
+                with background_priority():
+                    await self._get_panorama_image(location_data["pano_id"])
+
+    def _release_hint_prefetch(self, game):
+        """Stop prefetching for an ended game and return its unused hint locations to the pool."""
+        task = game.pop("hint_prefetch", None)
+        if task is not None:
+            task.cancel()
+        hints = game.get("hint_locations")
+        while hints:
+            self.location_pool.put(hints.popleft())
+
+    async def _next_hint_location(self, channel, game):
+        """A prefetched hint location if one is ready (topping the prefetch back up), otherwise a regular lookup."""
+        hints = game.get("hint_locations")
+        location_data = hints.popleft() if hints else None
+        self._start_hint_prefetch(game)  # also starts it for games restored after a restart
+        if location_data:
+            with self.tracer.span("find_location", country=game["country_code"], source="prefetch"):
+                return location_data
+        async with self._search_slot(channel.guild.id if getattr(channel, "guild", None) else None):
+            return await self._find_location(game["country_code"])
+
+    async def _deliver_hint(self, channel, game):
+        new_location_data = await self._next_hint_location(channel, game)
+        if new_location_data and self.games.get(channel.id) is not game:
+            # The game ended while we were searching; keep the location for a later game.
+            self.location_pool.put(new_location_data)
+            return
         if new_location_data:
+            hint_embed = discord.Embed(title="Extra View (North, East, South, West)", color=discord.Color.purple())
+            panorama_file = await self._attach_panorama(hint_embed, new_location_data['pano_id'])
+            if panorama_file:
+                with self.tracer.span("send", kind="hint"):
+                    await self.outbound.send(channel, embed=hint_embed, file=panorama_file, priority=PRIORITY_HINT)
+                return
+
             new_view_urls = self._get_street_view_image_urls(new_location_data['pano_id'])
+            if not self.api_limiter.charge("streetview_image", len(new_view_urls)):  # Discord fetches them for us
+                await channel.send("Today's Street View image budget is used up, so no extra views can be shown.", delete_after=10)
+                return
+            embeds = []
             for i in range(4):
                 direction_embed = discord.Embed(
                     title=f"Extra View facing {new_view_urls[i]['name']}",
                     color=discord.Color.purple()
                 )
                 direction_embed.set_image(url=new_view_urls[i]["url"])
-                await channel.send(embed=direction_embed)
+                embeds.append(direction_embed)
+            with self.tracer.span("send", kind="hint"):
+                await self.outbound.send(channel, embeds=embeds, priority=PRIORITY_HINT)
         else:
             await channel.send("Couldn't find an extra location right now. Try `!hint` again.")
 
@@ -630,25 +1073,103 @@ class CountryGuesser(commands.Cog, name="CountryGuesser"):
 
 
     
+    @commands.command(name="leaderboard", aliases=["lb"], help="Shows this server's top players by wins, streak or fastest guess.")
+    @commands.guild_only()
+    async def show_leaderboard(self, ctx, board: str = "wins"):
+        board = board.lower()
+        if board not in LEADERBOARDS:
+            await ctx.send(f"Unknown leaderboard. Choose one of: {', '.join(LEADERBOARDS)}.", delete_after=10)
+            return
+        players = self.game_store.leaderboard(ctx.guild.id, board)
+        if not players:
+            await ctx.send("No games have been won on this server yet.")
+            return
+
+        lines = []
+        for rank, player in enumerate(players, start=1):
+            if board == "wins":
+                score = f"{player['wins']} wins"
+            elif board == "streak":
+                score = f"best streak {player['best_streak']}"
+            else:
+                score = f"{player['fastest_seconds']:.1f}s"
+            lines.append(f"**{rank}.** <@{player['user_id']}> - {score}")
+        embed = discord.Embed(
+            title=f"🏆 Leaderboard - {board}",
+            description="\n".join(lines),
+            color=discord.Color.gold()
+        )
+        await ctx.send(embed=embed, allowed_mentions=discord.AllowedMentions.none())
+
+    @commands.command(name="search_stats", help="Shows per-country Street View search statistics (bot owner only).")
+    @commands.is_owner()
+    async def show_search_stats(self, ctx):
+        lines = self.search_stats.summary_lines()
+        if not lines:
+            await ctx.send("No Street View searches have been recorded yet.")
+            return
+
+        chunk = ""
+        for line in lines:
+            if len(chunk) + len(line) + 10 > 1900:
+                await ctx.send(f"```\n{chunk}```")
+                chunk = ""
+            chunk += line + "\n"
+        if chunk:
+            await ctx.send(f"```\n{chunk}```")
+
+    @commands.command(name="trace_stats", help="Shows per-stage latency percentiles, optionally for one country code (bot owner only).")
+    @commands.is_owner()
+    async def show_trace_stats(self, ctx, country_code: str = None):
+        lines = self.tracer.summary_lines(country_code)
+        scope = f"for {country_code.upper()}" if country_code else "across all countries"
+        if not lines:
+            await ctx.send(f"No timing spans have been recorded {scope} yet.")
+            return
+        await ctx.send(f"Stage latency {scope}:\n```\n" + "\n".join(lines) + "\n```")
+
+    @commands.command(name="api_budget", help="Shows today's Google API spend and rate limiter state (bot owner only).")
+    @commands.is_owner()
+    async def show_api_budget(self, ctx):
+        status = self.api_limiter.status()
+        budget = f"{status['daily_budget']:.2f} USD" if status["daily_budget"] > 0 else "unlimited"
+        calls = ", ".join(f"{endpoint}: {count}" for endpoint, count in sorted(status["calls"].items())) or "none"
+        mode = " (serving cached locations only)" if self.api_limiter.budget_exhausted(PRIORITY_USER) else ""
+        shared = f" (+{status['shared_spent']:.2f} USD by other shards)" if self.shared_state is not None else ""
+        await ctx.send(
+            f"Google API spend on {status['day']} (UTC): {status['spent']:.2f} USD{shared} of {budget}{mode}\n"
+            f"Calls: {calls}\nQueued for the rate limiter: {status['queued']}"
+        )
+
+    @commands.command(name="map_cache", help="Shows rendered map cache statistics (bot owner only).")
+    @commands.is_owner()
+    async def show_map_cache_stats(self, ctx):
+        stats = self.map_cache.stats()
+        hit_rate = f"{stats['hit_rate']:.0%}" if stats["hit_rate"] is not None else "-"
+        await ctx.send(
+            f"Map cache: {stats['entries']} maps, {stats['bytes'] / 1024 / 1024:.1f}/{stats['max_bytes'] / 1024 / 1024:.1f} MiB, "
+            f"{stats['hits']} hits, {stats['misses']} misses (hit rate {hit_rate})"
+        )
+
     @commands.command(name="eu", help="Displays a Europe map highlighting incorrect guesses.")
     async def show_europe_map(self, ctx):
         """Map of Europe with incorrect guesses highlighted."""
-        await self._show_continent_map(ctx, "Europe", eu_countries, "europe")
+        await self._show_continent_map(ctx, "eu")
 
     @commands.command(name="as", help="Displays an Asia map highlighting incorrect guesses.")
     async def show_asia_map(self, ctx):
         """Map of Asia with incorrect guesses highlighted."""
-        await self._show_continent_map(ctx, "Asia", as_countries, "asia")
+        await self._show_continent_map(ctx, "as")
 
     @commands.command(name="af", help="Displays an Africa map highlighting incorrect guesses.")
     async def show_africa_map(self, ctx):
         """Map of Africa with incorrect guesses highlighted."""
-        await self._show_continent_map(ctx, "Africa", af_countries, "africa")
+        await self._show_continent_map(ctx, "af")
 
     @commands.command(name="am", help="Displays an Americas map highlighting incorrect guesses.")
     async def show_americas_map(self, ctx):
         """Map of the Americas with incorrect guesses highlighted."""
-        await self._show_continent_map(ctx, "The Americas", am_countries, "world", auto_fit_bounds=True)
+        await self._show_continent_map(ctx, "am")
 
 
 async def setup(bot):
@@ -657,6 +1178,5 @@ async def setup(bot):
         print("Please set the GOOGLE_MAPS_API_KEY environment variable with your Google Maps API key.")
         return  # Exit early if the API key is not set
 
-    load_country_data()
     await bot.add_cog(CountryGuesser(bot))
     print("CountryGuesser cog loaded.")
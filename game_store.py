@@ -0,0 +1,287 @@
+import asyncio
+import bisect
+import json
+import sqlite3
+
+from storage import SQLiteThread
+
+
+LEADERBOARDS = ("wins", "streak", "fastest")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    channel_id INTEGER PRIMARY KEY,
+    guild_id INTEGER,
+    country_code TEXT NOT NULL,
+    country_name TEXT NOT NULL,
+    pano_id TEXT NOT NULL,
+    lat REAL NOT NULL,
+    lng REAL NOT NULL,
+    message_id INTEGER,
+    start_time REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS incorrect_guesses (
+    channel_id INTEGER PRIMARY KEY,
+    codes TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS players (
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    wins INTEGER NOT NULL DEFAULT 0,
+    current_streak INTEGER NOT NULL DEFAULT 0,
+    best_streak INTEGER NOT NULL DEFAULT 0,
+    fastest_seconds REAL,
+    PRIMARY KEY (guild_id, user_id)
+);
+CREATE TABLE IF NOT EXISTS guilds (
+    guild_id INTEGER PRIMARY KEY,
+    streak_user_id INTEGER
+);
+"""
+
+
+def _new_player(guild_id, user_id):
+    return {
+        "guild_id": guild_id,
+        "user_id": user_id,
+        "wins": 0,
+        "current_streak": 0,
+        "best_streak": 0,
+        "fastest_seconds": None,
+    }
+
+
+def _rank_key(board, player):
+    """Sort key for a leaderboard (smaller ranks higher), or None if the player is not on it."""
+    if board == "wins":
+        return (-player["wins"], player["user_id"]) if player["wins"] else None
+    if board == "streak":
+        return (-player["best_streak"], player["user_id"]) if player["best_streak"] else None
+    if player["fastest_seconds"] is None:
+        return None
+    return (player["fastest_seconds"], player["user_id"])
+
+
+class _Ranking:
+    """Sorted (key, user_id) list kept up to date one player at a time."""
+
+    def __init__(self):
+        self._entries = []
+        self._keys = {}  # user_id -> current key
+
+    def update(self, user_id, key):
+        old_key = self._keys.pop(user_id, None)
+        if old_key is not None:
+            del self._entries[bisect.bisect_left(self._entries, old_key)]
+        if key is not None:
+            bisect.insort(self._entries, key)
+            self._keys[user_id] = key
+
+    def top(self, limit):
+        return [key[-1] for key in self._entries[:limit]]
+
+
+class GameStore:
+    """Durable SQLite (WAL) store for active games, incorrect guesses and per-guild player stats.
+
+    Everything is loaded into memory at startup, so reads never touch the
+    disk. Writes are write-behind: each change replaces any pending write for
+    the same row, and a background task flushes the pending rows in a single
+    transaction every ``flush_interval`` seconds (sooner once ``max_pending``
+    rows are waiting), on the store's own writer thread. Leaderboards are
+    sorted indexes updated on every win, so a query is a slice.
+    """
+
+    def __init__(self, path, flush_interval=2.0, max_pending=500):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._db = SQLiteThread(path, "game-store")
+        self._pending = {}  # (table, key) -> row dict, or None to delete the row
+        self._flush_requested = asyncio.Event()
+        self._flush_task = None
+        self._games = {}  # channel_id -> stored game row
+        self._incorrect_guesses = {}  # channel_id -> list of codes
+        self._players = {}  # (guild_id, user_id) -> player stats
+        self._streak_holders = {}  # guild_id -> user_id on a winning streak
+        self._rankings = {}  # (guild_id, board) -> _Ranking
+
+    async def open(self):
+        try:
+            await self._db.open(_SCHEMA)
+            games, incorrect, players, guilds = await self._db.run(self._load_all)
+        except sqlite3.Error as e:
+            print(f"Error opening game store {self.path}: {e}. Games and leaderboards will not be persisted.")
+            return
+        self._games = {row["channel_id"]: row for row in games}
+        self._incorrect_guesses = {row["channel_id"]: json.loads(row["codes"]) for row in incorrect}
+        for row in players:
+            player = self._players[(row["guild_id"], row["user_id"])] = row
+            self._reindex(player)
+        self._streak_holders = {row["guild_id"]: row["streak_user_id"] for row in guilds}
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        print(f"Loaded {len(self._games)} active games and stats for {len(self._players)} players from {self.path}.")
+
+    async def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self._flush()
+        await self._db.close()
+
+    # Games
+
+    def active_games(self):
+        """Stored rows of games that were in progress at the last flush before shutdown."""
+        return list(self._games.values())
+
+    def incorrect_guesses(self):
+        return {channel_id: set(codes) for channel_id, codes in self._incorrect_guesses.items()}
+
+    def save_game(self, game):
+        row = {
+            "channel_id": game["channel_id"],
+            "guild_id": game.get("guild_id"),
+            "country_code": game["country_code"],
+            "country_name": game["country_name"],
+            "pano_id": game["pano_id"],
+            "lat": game["lat"],
+            "lng": game["lng"],
+            "message_id": game.get("message_id"),
+            "start_time": game["start_time"].timestamp(),
+        }
+        self._games[row["channel_id"]] = row
+        self._queue("games", row["channel_id"], row)
+
+    def end_game(self, channel_id):
+        if self._games.pop(channel_id, None) is not None:
+            self._queue("games", channel_id, None)
+
+    def set_incorrect_guesses(self, channel_id, codes):
+        codes = sorted(codes)
+        self._incorrect_guesses[channel_id] = codes
+        self._queue("incorrect_guesses", channel_id, {"channel_id": channel_id, "codes": json.dumps(codes)})
+
+    # Player stats and leaderboards
+
+    def record_win(self, guild_id, user_id, seconds):
+        """Count a win, extend or start the winner's streak and keep their fastest time; returns their stats."""
+        player = self._player(guild_id, user_id)
+        holder = self._streak_holders.get(guild_id)
+        if holder is not None and holder != user_id:
+            self._break_streak(guild_id, holder)
+        player["wins"] += 1
+        player["current_streak"] += 1
+        player["best_streak"] = max(player["best_streak"], player["current_streak"])
+        if player["fastest_seconds"] is None or seconds < player["fastest_seconds"]:
+            player["fastest_seconds"] = seconds
+        self._streak_holders[guild_id] = user_id
+        self._queue("guilds", guild_id, {"guild_id": guild_id, "streak_user_id": user_id})
+        self._player_changed(player)
+        return dict(player)
+
+    def record_no_winner(self, guild_id):
+        """A game ended without a winner (e.g. !stop_g): the current streak is broken."""
+        holder = self._streak_holders.pop(guild_id, None)
+        if holder is not None:
+            self._break_streak(guild_id, holder)
+            self._queue("guilds", guild_id, None)
+
+    def player(self, guild_id, user_id):
+        player = self._players.get((guild_id, user_id))
+        return dict(player) if player is not None else None
+
+    def leaderboard(self, guild_id, board="wins", limit=10):
+        """Top players of the guild on one of LEADERBOARDS, best first."""
+        if board not in LEADERBOARDS:
+            raise ValueError(f"Unknown leaderboard: {board}")
+        ranking = self._rankings.get((guild_id, board))
+        if ranking is None:
+            return []
+        return [dict(self._players[(guild_id, user_id)]) for user_id in ranking.top(limit)]
+
+    def _player(self, guild_id, user_id):
+        key = (guild_id, user_id)
+        if key not in self._players:
+            self._players[key] = _new_player(guild_id, user_id)
+        return self._players[key]
+
+    def _break_streak(self, guild_id, user_id):
+        player = self._players.get((guild_id, user_id))
+        if player is not None and player["current_streak"]:
+            player["current_streak"] = 0
+            self._player_changed(player)
+
+    def _player_changed(self, player):
+        self._reindex(player)
+        self._queue("players", (player["guild_id"], player["user_id"]), dict(player))
+
+    def _reindex(self, player):
+        for board in LEADERBOARDS:
+            ranking = self._rankings.get((player["guild_id"], board))
+            if ranking is None:
+                ranking = self._rankings[(player["guild_id"], board)] = _Ranking()
+            ranking.update(player["user_id"], _rank_key(board, player))
+
+    # Write-behind
+
+    def _queue(self, table, key, row):
+        if self._db.conn is None:
+            return
+        self._pending[(table, key)] = row
+        if len(self._pending) >= self.max_pending:
+            self._flush_requested.set()
+
+    async def _flush(self):
+        if not self._pending or self._db.conn is None:
+            return
+        batch, self._pending = self._pending, {}
+        try:
+            await self._db.run(self._write_batch, batch)
+        except sqlite3.Error as e:
+            print(f"Game store write failed ({len(batch)} rows): {e}")
+            # Keep the rows for the next flush unless newer values have been queued meanwhile.
+            for key, row in batch.items():
+                self._pending.setdefault(key, row)
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self._flush()
+
+    # The methods below run on the database thread only.
+
+    def _load_all(self):
+        return tuple(
+            [dict(row) for row in self._db.conn.execute(f"SELECT * FROM {table}")]
+            for table in ("games", "incorrect_guesses", "players", "guilds")
+        )
+
+    _KEYS = {
+        "games": ("channel_id",),
+        "incorrect_guesses": ("channel_id",),
+        "players": ("guild_id", "user_id"),
+        "guilds": ("guild_id",),
+    }
+
+    def _write_batch(self, batch):
+        conn = self._db.conn
+        with conn:
+            for (table, key), row in batch.items():
+                columns = self._KEYS[table]
+                if row is None:
+                    values = key if isinstance(key, tuple) else (key,)
+                    where = " AND ".join(f"{column} = ?" for column in columns)
+                    conn.execute(f"DELETE FROM {table} WHERE {where}", values)
+                else:
+                    names = ", ".join(row)
+                    placeholders = ", ".join(f":{name}" for name in row)
+                    conn.execute(f"INSERT OR REPLACE INTO {table} ({names}) VALUES ({placeholders})", row)
@@ -0,0 +1,251 @@
+import math
+import os
+import pickle
+
+import numpy as np
+import shapely
+from shapely.strtree import STRtree
+
+
+# Known ISO_A2 mismatches in the ne_admin_0_map_units_50m.geojson file
+ISO_A2_CORRECTIONS = {"Norway": "NO", "Réunion": "RE"}
+
+
+# Bump when the snapshot layout or the corrections change so old snapshots are rebuilt
+WORLD_SNAPSHOT_VERSION = 1
+
+
+def read_world_geojson(path):
+    """Read the world GeoJSON, fix known ISO_A2 mismatches and keep only the columns the bot uses."""
+    import geopandas as gpd  # Heavy import, only needed when the snapshot has to be rebuilt
+
+    world_gdf = gpd.read_file(path)
+    print(f"Loaded world GeoJSON data with {len(world_gdf)} countries")
+    for name, correct_iso_a2 in ISO_A2_CORRECTIONS.items():
+        mask = world_gdf['NAME'] == name
+        if mask.any():
+            current_iso_a2 = world_gdf.loc[mask, 'ISO_A2'].iloc[0]
+            if current_iso_a2 != correct_iso_a2:
+                world_gdf.loc[mask, 'ISO_A2'] = correct_iso_a2
+                print(f"Corrected ISO_A2 for {name} from '{current_iso_a2}' to '{correct_iso_a2}'.")
+        else:
+            print(f"Warning: '{name}' not found in GeoJSON for ISO_A2 correction.")
+    return world_gdf[["NAME", "ISO_A2", "geometry"]]
+
+
+def load_world_gdf(path, snapshot_path=None):
+    """Load the world geometries from a binary snapshot, rebuilding it when the source GeoJSON has changed.
+
+    The snapshot stores the columns as plain lists plus WKB geometry, which
+    loads many times faster than parsing the GeoJSON.
+    """
+    import geopandas as gpd
+
+    snapshot_path = snapshot_path or f"{path}.snapshot.pkl"
+    source = os.stat(path)
+    source_stamp = (source.st_mtime_ns, source.st_size)
+
+    try:
+        with open(snapshot_path, "rb") as f:
+            snapshot = pickle.load(f)
+        if snapshot.get("version") == WORLD_SNAPSHOT_VERSION and snapshot.get("source") == source_stamp:
+            world_gdf = gpd.GeoDataFrame(
+                {"NAME": snapshot["name"], "ISO_A2": snapshot["iso_a2"]},
+                geometry=shapely.from_wkb(snapshot["wkb"]),
+                crs=snapshot["crs"],
+            )
+            print(f"Loaded world geometry snapshot with {len(world_gdf)} countries")
+            return world_gdf
+    except FileNotFoundError:
+        pass
+    except (OSError, pickle.UnpicklingError, EOFError, KeyError, AttributeError) as e:
+        print(f"Ignoring unreadable world geometry snapshot {snapshot_path}: {e}")
+
+    world_gdf = read_world_geojson(path)
+    snapshot = {
+        "version": WORLD_SNAPSHOT_VERSION,
+        "source": source_stamp,
+        "name": world_gdf["NAME"].tolist(),
+        "iso_a2": world_gdf["ISO_A2"].tolist(),
+        "wkb": shapely.to_wkb(world_gdf.geometry.to_numpy()),
+        "crs": world_gdf.crs.to_string() if world_gdf.crs else None,
+    }
+    tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, snapshot_path)
+        print(f"Wrote world geometry snapshot to {snapshot_path}")
+    except OSError as e:
+        print(f"Could not write world geometry snapshot {snapshot_path}: {e}")
+    return world_gdf
+
+
+def sample_in_bounds(bounds, n, rng=None):
+    """Draw n uniform (lat, lng) points inside a [south, west, north, east] box; returns an (n, 2) array."""
+    rng = rng or np.random.default_rng()
+    south, west, north, east = bounds
+    if east < west:  # box crosses the antimeridian
+        east += 360
+    lats = rng.uniform(south, north, n)
+    lngs = (rng.uniform(west, east, n) + 180) % 360 - 180
+    return np.column_stack((lats, lngs))
+
+
+def bounds_polygon(bounds):
+    """A [south, west, north, east] box as a (lng, lat) shapely geometry, split in two when it crosses the antimeridian."""
+    south, west, north, east = bounds
+    if west <= east:
+        return shapely.box(west, south, east, north)
+    return shapely.union(shapely.box(west, south, 180, north), shapely.box(-180, south, east, north))
+
+
+def bounds_contain(bounds, lat, lng, margin=0.0):
+    """Check a point against a [south, west, north, east] box, allowing boxes that cross the antimeridian."""
+    south, west, north, east = bounds
+    if not south - margin <= lat <= north + margin:
+        return False
+    if west <= east:
+        return west - margin <= lng <= east + margin
+    return lng >= west - margin or lng <= east + margin
+
+
+class CountryResolver:
+    """Offline point-in-polygon country lookup over the world GeoJSON geometries.
+
+    ``match`` answers whether a point lies in a given country with True or
+    False, or None when the point is too close to a border (or in a territory
+    without an ISO code) to decide locally.
+    """
+
+    def __init__(self, world_gdf, country_bounds, border_tolerance=0.02, bounds_margin=0.5):
+        codes = world_gdf["ISO_A2"].astype(str).str.lower()
+        valid = codes.str.fullmatch(r"[a-z]{2}") & world_gdf.geometry.notna()
+        self._geometries = world_gdf.geometry[valid].to_numpy()
+        self._codes = codes[valid].to_numpy()
+        # Unassigned territories (ISO_A2 "-99") are indexed too so points inside them stay ambiguous.
+        self._unassigned = world_gdf.geometry[~valid & world_gdf.geometry.notna()].to_numpy()
+        shapely.prepare(self._geometries)
+        self._tree = STRtree(self._geometries)
+        self._unassigned_tree = STRtree(self._unassigned) if len(self._unassigned) else None
+        self.country_bounds = country_bounds
+        self.border_tolerance = border_tolerance
+        self.bounds_margin = bounds_margin
+
+    def resolve(self, lat, lng):
+        """Return the lower-case ISO_A2 code of the country containing the point, or None if ambiguous."""
+        point = shapely.Point(lng, lat)
+        hits = self._tree.query(point, predicate="intersects")
+        codes = set(self._codes[hits])
+        if len(codes) != 1:
+            return None
+        # A pano right on a border or coastline may belong to the neighbour; let the caller decide.
+        nearby = self._tree.query(point, predicate="dwithin", distance=self.border_tolerance)
+        if set(self._codes[nearby]) != codes:
+            return None
+        if self._unassigned_tree is not None and len(
+            self._unassigned_tree.query(point, predicate="dwithin", distance=self.border_tolerance)
+        ):
+            return None
+        return codes.pop()
+
+    def match(self, lat, lng, country_code):
+        """Return True/False if the point is (not) in the country, or None when it cannot be decided offline."""
+        country_code = country_code.lower()
+        bounds = self.country_bounds.get(country_code)
+        if bounds is not None and not bounds_contain(bounds, lat, lng, self.bounds_margin):
+            return False
+        found_code = self.resolve(lat, lng)
+        if found_code is None:
+            return None
+        return found_code == country_code
+
+
+class CountrySampler:
+    """Draws candidate points inside a country's actual land area instead of its bounding box.
+
+    Each country's geometry is rasterized once (lazily) into a mask of grid
+    cells whose centres fall inside it; sampling then picks cells weighted by
+    their true area and jitters uniformly within each cell, so thousands of
+    candidates come out of a single vectorized call.
+
+    Geometries are first clipped to the country's ``country_bounds`` box, the
+    same box CountryResolver.match rejects points outside of, so no candidate
+    is drawn in an area the search would throw away (e.g. Alaska for the
+    mainland-only United States box).
+    """
+
+    def __init__(self, world_gdf, country_bounds=None, target_cells=20000):
+        codes = world_gdf["ISO_A2"].astype(str).str.lower()
+        valid = codes.str.fullmatch(r"[a-z]{2}") & world_gdf.geometry.notna()
+        self._geometries = {
+            code: shapely.union_all(group.to_numpy())
+            for code, group in world_gdf.geometry[valid].groupby(codes[valid])
+        }
+        self.country_bounds = dict(country_bounds or {})
+        self.target_cells = target_cells
+        self._masks = {}
+
+    def set_country_bounds(self, country_bounds):
+        """Switch to reloaded bounds, rebuilding the masks of the countries whose box changed."""
+        for code in set(self.country_bounds) | set(country_bounds):
+            if self.country_bounds.get(code) != country_bounds.get(code):
+                self._masks.pop(code, None)
+        self.country_bounds = dict(country_bounds)
+
+    def __contains__(self, country_code):
+        return country_code.lower() in self._geometries
+
+    def label(self, country_code):
+        """Name recorded in the search stats for candidates drawn for this country."""
+        return "polygon"
+
+    def cells(self, country_code):
+        """(centres, area weights, cell_size) of the country's grid, or None if the country is unknown or has no land in its box."""
+        country_code = country_code.lower()
+        geometry = self._geometries.get(country_code)
+        if geometry is None:
+            return None
+        if country_code not in self._masks:
+            bounds = self.country_bounds.get(country_code)
+            if bounds is not None:
+                geometry = shapely.intersection(geometry, bounds_polygon(bounds))
+            self._masks[country_code] = self._build_mask(geometry) if not geometry.is_empty else None
+        return self._masks[country_code]
+
+    def _build_mask(self, geometry):
+        west, south, east, north = geometry.bounds
+        cell_size = math.sqrt(max((east - west) * (north - south), 1e-9) / self.target_cells)
+        lngs = np.arange(west + cell_size / 2, east, cell_size)
+        lats = np.arange(south + cell_size / 2, north, cell_size)
+        grid_lng, grid_lat = np.meshgrid(lngs, lats)
+        grid_lng, grid_lat = grid_lng.ravel(), grid_lat.ravel()
+        inside = shapely.contains_xy(geometry, grid_lng, grid_lat)
+        if not inside.any():
+            # Country smaller than a cell: sample around a point guaranteed to be inside it.
+            point = geometry.representative_point()
+            cell_size = min(cell_size, 0.01)
+            centres = np.array([[point.y, point.x]])
+        else:
+            centres = np.column_stack((grid_lat[inside], grid_lng[inside]))
+        weights = np.maximum(np.cos(np.radians(centres[:, 0])), 1e-6)
+        return centres, weights / weights.sum(), cell_size
+
+    def sample(self, country_code, n, rng=None):
+        """Draw n (lat, lng) points inside the country as an (n, 2) array, or None if the country is unknown."""
+        cells = self.cells(country_code)
+        if cells is None:
+            return None
+        centres, weights, cell_size = cells
+        return sample_cells(centres, weights, cell_size, n, rng)
+
+
+def sample_cells(centres, weights, cell_size, n, rng=None):
+    """Pick n grid cells with the given probabilities and jitter uniformly inside each; returns an (n, 2) array."""
+    rng = rng or np.random.default_rng()
+    picked = centres[rng.choice(len(centres), size=n, p=weights)]
+    jitter = rng.uniform(-cell_size / 2, cell_size / 2, size=(n, 2))
+    points = picked + jitter
+    points[:, 0] = np.clip(points[:, 0], -90, 90)
+    points[:, 1] = (points[:, 1] + 180) % 360 - 180
+    return points
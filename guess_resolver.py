@@ -0,0 +1,164 @@
+import functools
+import json
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from types import MappingProxyType
+
+
+# ISO3 codes that are also everyday words; accepting them would turn ordinary chat into guesses.
+ISO3_EXCLUDED = {"and"}
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_guess(text):
+    """Lower-case, strip diacritics and punctuation and collapse whitespace ("Côte d'Ivoire" -> "cote divoire")."""
+    text = unicodedata.normalize("NFKD", text.casefold().replace("ı", "i"))
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = _PUNCTUATION.sub("", text.replace("&", " and "))
+    text = _WHITESPACE.sub(" ", text).strip()
+    if text.startswith("the "):
+        text = text[4:]
+    return text
+
+
+def load_country_aliases(path):
+    """Read {code: {"iso3": ..., "aliases": [...]}} from the aliases file; returns {} if it is missing."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        print(f"Warning: {path} not found. ISO3 codes and aliases will not be accepted as guesses.")
+        return {}
+    except json.JSONDecodeError as e:
+        print(f"Error decoding {path}: {e}. ISO3 codes and aliases will not be accepted as guesses.")
+        return {}
+    return {code.lower(): entry for code, entry in data.items()}
+
+
+def _edit_distance(a, b, limit):
+    """Levenshtein distance between a and b, giving up early once it must exceed limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _bigrams(word):
+    return Counter(word[i:i + 2] for i in range(len(word) - 1))
+
+
+class _TypoIndex:
+    """Bigram index over normalized names for bounded edit-distance lookups.
+
+    Each edit breaks at most two of a word's bigrams, so a name within k edits
+    shares at least max(len) - 1 - 2k bigrams with the guess. Only names that
+    pass that count and the length window reach the exact edit-distance check,
+    which keeps a miss to a handful of postings lookups instead of a walk over
+    every name.
+    """
+
+    def __init__(self, words):
+        self._words = list(words)
+        self._postings = defaultdict(list)  # bigram -> [(word index, occurrences)]
+        for index, word in enumerate(self._words):
+            for bigram, count in _bigrams(word).items():
+                self._postings[bigram].append((index, count))
+
+    def search(self, word, max_distance):
+        """Return [(distance, word)] for every word within max_distance."""
+        if len(word) - 1 - 2 * max_distance <= 0:
+            # The bigram bound proves nothing for words this short; check every name.
+            candidates = range(len(self._words))
+        else:
+            shared = defaultdict(int)
+            for bigram, count in _bigrams(word).items():
+                for index, occurrences in self._postings.get(bigram, ()):
+                    shared[index] += min(count, occurrences)
+            candidates = [
+                index for index, count in shared.items()
+                if count >= max(len(word), len(self._words[index])) - 1 - 2 * max_distance
+            ]
+        matches = []
+        for index in candidates:
+            candidate = self._words[index]
+            distance = _edit_distance(word, candidate, max_distance)
+            if distance <= max_distance:
+                matches.append((distance, candidate))
+        return matches
+
+
+class GuessResolver:
+    """Immutable index from anything a player might type to a lower-case ISO_A2 code.
+
+    Exact names, aliases, ISO2 and ISO3 codes resolve with one dict lookup;
+    anything else of five or more characters falls back to a bigram-indexed
+    typo search (one edit, two for guesses of nine or more characters),
+    accepted only when the closest match is unambiguous. The matched name
+    limits the edits too: names shorter than six characters ("chile",
+    "oman") must be typed exactly, or everyday words like "child" and
+    "woman" would count as guesses.
+    """
+
+    def __init__(self, name_to_code, aliases=None):
+        aliases = aliases or {}
+        valid_codes = set(name_to_code.values())
+        exact = {}
+        for code in valid_codes:
+            exact[code] = code
+            iso3 = aliases.get(code, {}).get("iso3", "").lower()
+            if iso3 and iso3 not in ISO3_EXCLUDED:
+                exact[iso3] = code
+        names = {}
+        for name, code in name_to_code.items():
+            names[normalize_guess(name)] = code
+        for code, entry in aliases.items():
+            if code not in valid_codes:
+                continue
+            for alias in entry.get("aliases", []):
+                names[normalize_guess(alias)] = code
+        # Codes win over names on collisions so "in" stays India rather than a fuzzy name.
+        self._exact = MappingProxyType({**names, **exact})
+        self._names = MappingProxyType(names)
+        self._typo_index = _TypoIndex(sorted(names))
+        self._max_name_length = max((len(name) for name in names), default=0)
+        self.resolve = functools.lru_cache(maxsize=4096)(self._resolve)
+
+    @staticmethod
+    def _max_typos(length):
+        if length < 5:
+            return 0
+        return 1 if length < 9 else 2
+
+    @staticmethod
+    def _typos_allowed_for_name(name):
+        if len(name) < 6:
+            return 0
+        return 1 if len(name) < 9 else 2
+
+    def _resolve(self, text):
+        guess = normalize_guess(text)
+        code = self._exact.get(guess)
+        if code is not None:
+            return code
+        max_typos = self._max_typos(len(guess))
+        if not max_typos or len(guess) > self._max_name_length + max_typos:
+            return None  # Too short to correct safely, or an ordinary chat message too long to be a name
+        matches = [
+            (distance, word) for distance, word in self._typo_index.search(guess, max_typos)
+            if distance <= self._typos_allowed_for_name(word)
+        ]
+        if not matches:
+            return None
+        best = min(distance for distance, _ in matches)
+        codes = {self._names[word] for distance, word in matches if distance == best}
+        return codes.pop() if len(codes) == 1 else None
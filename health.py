@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+from aiohttp import web
+
+import metrics
+
+
+class HealthServer:
+    """Small aiohttp server that runs on the bot's own event loop.
+
+    ``/`` is the old keep-alive page, ``/healthz`` answers 200 only once the
+    gateway is connected, the CountryGuesser cog is loaded and the world map
+    has finished loading (503 otherwise), and ``/metrics`` serves Prometheus
+    text. A background task samples event loop lag.
+    """
+
+    def __init__(self, bot, host="0.0.0.0", port=8000, lag_interval=1.0):
+        self.bot = bot
+        self.host = host
+        self.port = port
+        self.lag_interval = lag_interval
+        self._runner = None
+        self._lag_task = None
+        self._app = web.Application()
+        self._app.router.add_get("/", self._index)
+        self._app.router.add_get("/healthz", self._healthz)
+        self._app.router.add_get("/metrics", self._metrics)
+        metrics.ACTIVE_GAMES.set_function(self._active_games)
+        metrics.GOOGLE_API_SPEND.set_function(self._api_spend)
+
+    def _cog(self):
+        return self.bot.get_cog("CountryGuesser")
+
+    def _active_games(self):
+        cog = self._cog()
+        return len(cog.games) if cog is not None else 0
+
+    def _api_spend(self):
+        cog = self._cog()
+        return cog.api_limiter.spent_today() if cog is not None else 0
+
+    def readiness(self):
+        cog = self._cog()
+        return {
+            "gateway": self.bot.is_ready() and not self.bot.is_closed(),
+            "cog": cog is not None,
+            "world_map": cog is not None and cog.world_gdf is not None,
+        }
+
+    async def _index(self, request):
+        return web.Response(text="Your Bot Is Ready")
+
+    async def _healthz(self, request):
+        checks = self.readiness()
+        return web.json_response(checks, status=200 if all(checks.values()) else 503)
+
+    async def _metrics(self, request):
+        return web.Response(text=metrics.render_metrics(), content_type="text/plain", charset="utf-8")
+
+    async def _measure_loop_lag(self):
+        while True:
+            expected = time.perf_counter() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            metrics.EVENT_LOOP_LAG.set(max(0.0, time.perf_counter() - expected))
+
+    async def start(self):
+        self._runner = web.AppRunner(self._app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self._lag_task = asyncio.create_task(self._measure_loop_lag())
+        print(f"Health server listening on {self.host}:{self.port}")
+
+    async def stop(self):
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            self._lag_task = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
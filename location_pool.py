@@ -0,0 +1,101 @@
+import asyncio
+import random
+from collections import deque
+
+
+class LocationPool:
+    """Bounded per-country pool of pre-validated Street View locations.
+
+    A background task keeps every country between ``low_watermark`` and
+    ``high_watermark`` entries by calling ``finder(country_code)``; ``take``
+    pops a ready location in O(1) or returns None when the country is empty.
+    """
+
+    def __init__(self, finder, country_codes, low_watermark=1, high_watermark=3, refill_delay=1.0):
+        if low_watermark < 0 or high_watermark < max(low_watermark, 1):
+            raise ValueError("Watermarks must satisfy 0 <= low_watermark <= high_watermark and high_watermark >= 1")
+        self._finder = finder
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.refill_delay = refill_delay
+        self._pools = {code: deque() for code in country_codes}
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def __len__(self):
+        return sum(len(pool) for pool in self._pools.values())
+
+    def size(self, country_code):
+        pool = self._pools.get(country_code.lower())
+        return len(pool) if pool is not None else 0
+
+    def take(self, country_code):
+        """Pop a ready location for the country, or None if none is pooled."""
+        pool = self._pools.get(country_code.lower())
+        if not pool:
+            return None
+        location = pool.popleft()
+        if len(pool) < self.low_watermark:
+            self._wakeup.set()
+        return location
+
+    def put(self, location):
+        """Add a validated location; returns False if the country is already full."""
+        pool = self._pools.get(location["country_code"])
+        if pool is None or len(pool) >= self.high_watermark:
+            return False
+        pool.append(location)
+        return True
+
+    def set_countries(self, country_codes):
+        """Track a new set of countries, keeping the pooled locations of those that remain."""
+        self._pools = {code: self._pools.get(code, deque()) for code in country_codes}
+        self._wakeup.set()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refill_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _countries_below_low_watermark(self):
+        return [code for code, pool in self._pools.items() if len(pool) < self.low_watermark]
+
+    async def _refill_country(self, country_code):
+        pool = self._pools[country_code]
+        while len(pool) < self.high_watermark:
+            location = await self._finder(country_code)
+            if not location:
+                # Give up on this country for now; it is retried on the next pass.
+                return
+            if not self.put(location):
+                return
+            await asyncio.sleep(self.refill_delay)
+
+    async def _refill_loop(self):
+        while True:
+            self._wakeup.clear()
+            pending = self._countries_below_low_watermark()
+            random.shuffle(pending)
+            for country_code in pending:
+                try:
+                    await self._refill_country(country_code)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"Location pool refill failed for {country_code}: {e}")
+            if not self._countries_below_low_watermark():
+                await self._wakeup.wait()
+            else:
+                # Some countries could not be filled; back off before retrying.
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=60)
+                except asyncio.TimeoutError:
+                    pass
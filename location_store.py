@@ -0,0 +1,181 @@
+import sqlite3
+import time
+
+from storage import SQLiteThread
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS locations (
+    pano_id TEXT PRIMARY KEY,
+    country_code TEXT NOT NULL,
+    lat REAL NOT NULL,
+    lng REAL NOT NULL,
+    found_at REAL NOT NULL,
+    last_served_at REAL,
+    serve_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_locations_country ON locations (country_code);
+"""
+
+
+class LocationStore:
+    """Durable SQLite (WAL) cache of validated Street View panoramas.
+
+    Rows are loaded into memory once at startup so lookups never touch the
+    disk; inserts and serve bookkeeping are written by a single background
+    thread so the event loop never waits on SQLite.
+
+    A cached panorama is only served again after ``reuse_interval`` seconds
+    and is retired once it has been served ``max_serves`` times.
+
+    Several processes may open the same database; ``refresh`` picks up the
+    panoramas they added or served since the previous refresh.
+    """
+
+    def __init__(self, path, reuse_interval=24 * 3600, max_serves=10):
+        self.path = path
+        self.reuse_interval = reuse_interval
+        self.max_serves = max_serves
+        self._locations = {}  # country_code -> {pano_id: row dict}
+        self._db = SQLiteThread(path, "location-store")
+        self._synced_at = 0.0
+
+    def __len__(self):
+        return sum(len(rows) for rows in self._locations.values())
+
+    def count(self, country_code):
+        return len(self._locations.get(country_code.lower(), ()))
+
+    async def open(self):
+        self._synced_at = time.time()
+        try:
+            await self._db.open(_SCHEMA)
+            rows = await self._db.run(self._load_all)
+        except sqlite3.Error as e:
+            print(f"Error opening location cache {self.path}: {e}. Validated locations will not be persisted.")
+            return
+        for row in rows:
+            self._locations.setdefault(row["country_code"], {})[row["pano_id"]] = row
+        print(f"Loaded {len(rows)} cached Street View locations from {self.path}.")
+
+    async def refresh(self):
+        """Merge in rows other processes inserted or served since the last refresh; returns how many changed."""
+        if self._db.conn is None:
+            return 0
+        # Overlap the windows a little so a write committed just before the previous query is not missed.
+        since = self._synced_at - 5
+        self._synced_at = time.time()
+        try:
+            rows = await self._db.run(self._load_changed, since)
+        except sqlite3.Error as e:
+            print(f"Location cache refresh failed: {e}")
+            return 0
+        changed = 0
+        for row in rows:
+            country_rows = self._locations.setdefault(row["country_code"], {})
+            current = country_rows.get(row["pano_id"])
+            if current is None:
+                country_rows[row["pano_id"]] = row
+                changed += 1
+            elif row["serve_count"] > current["serve_count"]:
+                current["last_served_at"] = max(row["last_served_at"], current["last_served_at"] or 0)
+                current["serve_count"] = row["serve_count"]
+                changed += 1
+        return changed
+
+    async def close(self):
+        await self._db.close()
+
+    def take(self, country_code, ignore_reuse_interval=False):
+        """Return the least recently served cached location that is due for reuse, or None."""
+        rows = self._locations.get(country_code.lower())
+        if not rows:
+            return None
+        now = time.time()
+        best = None
+        for row in rows.values():
+            if (not ignore_reuse_interval and row["last_served_at"] is not None
+                    and now - row["last_served_at"] < self.reuse_interval):
+                continue
+            if best is None or (row["last_served_at"] or 0) < (best["last_served_at"] or 0):
+                best = row
+        if best is None:
+            return None
+        self._mark_served(best, now)
+        return self._to_location(best)
+
+    def add(self, location):
+        """Remember a freshly validated location; it counts as served right away."""
+        country_code = location["country_code"]
+        rows = self._locations.setdefault(country_code, {})
+        if location["pano_id"] in rows:
+            self._mark_served(rows[location["pano_id"]], time.time())
+            return
+        row = {
+            "pano_id": location["pano_id"],
+            "country_code": country_code,
+            "lat": location["lat"],
+            "lng": location["lng"],
+            "found_at": time.time(),
+            "last_served_at": time.time(),
+            "serve_count": 1,
+        }
+        rows[row["pano_id"]] = row
+        self._submit(self._insert, dict(row))
+
+    def _mark_served(self, row, now):
+        row["last_served_at"] = now
+        row["serve_count"] += 1
+        if row["serve_count"] >= self.max_serves:
+            # Served often enough; retire it so games keep seeing new places.
+            del self._locations[row["country_code"]][row["pano_id"]]
+            self._submit(self._delete, row["pano_id"])
+        else:
+            self._submit(self._update_served, row["pano_id"], now, row["serve_count"])
+
+    def _to_location(self, row):
+        return {
+            "pano_id": row["pano_id"],
+            "country_code": row["country_code"],
+            "lat": row["lat"],
+            "lng": row["lng"],
+        }
+
+    def _submit(self, fn, *args):
+        if self._db.conn is None:
+            return
+        future = self._db.submit(fn, *args)
+        future.add_done_callback(self._report_write_error)
+
+    @staticmethod
+    def _report_write_error(future):
+        error = future.exception()
+        if error is not None:
+            print(f"Location cache write failed: {error}")
+
+    # The methods below run on the database thread only.
+
+    def _load_all(self):
+        return [dict(row) for row in self._db.conn.execute("SELECT * FROM locations")]
+
+    def _load_changed(self, since):
+        return [dict(row) for row in self._db.conn.execute("SELECT * FROM locations WHERE last_served_at >= ?", (since,))]
+
+    def _insert(self, row):
+        with self._db.conn:
+            self._db.conn.execute(
+                "INSERT OR IGNORE INTO locations (pano_id, country_code, lat, lng, found_at, last_served_at, serve_count) "
+                "VALUES (:pano_id, :country_code, :lat, :lng, :found_at, :last_served_at, :serve_count)",
+                row,
+            )
+
+    def _update_served(self, pano_id, served_at, serve_count):
+        with self._db.conn:
+            self._db.conn.execute(
+                "UPDATE locations SET last_served_at = ?, serve_count = ? WHERE pano_id = ?",
+                (served_at, serve_count, pano_id),
+            )
+
+    def _delete(self, pano_id):
+        with self._db.conn:
+            self._db.conn.execute("DELETE FROM locations WHERE pano_id = ?", (pano_id,))
@@ -1,42 +1,95 @@
-from flask import Flask
-from threading import Thread
 from discord.ext import tasks, commands
 from itertools import cycle
+import asyncio
 import discord
-import requests # Import the requests library
 import g # Import the g.py file
+from health import HealthServer
+from caches import ExpiringDict
 import os # Import the os library
 from dotenv import load_dotenv # Import dotenv
 
 load_dotenv() # Load environment variables from .env file
 
-app = Flask('')
-
-
-@app.route('/')
-def main():
-  return "Your Bot Is Ready"
-
-
-def run():
-  app.run(host="0.0.0.0", port=8000)
+TOKEN = os.getenv("TOKEN")
+HEALTH_HOST = os.getenv("HEALTH_HOST", "0.0.0.0")
+HEALTH_PORT = int(os.getenv("HEALTH_PORT", "8000"))
+# Gateway sharding: SHARD_COUNT shards in total, of which this process runs SHARD_IDS (e.g. "0-3" or "0,2";
+# empty = all of them). supervisor.py sets both for each process; SHARD_COUNT=0 runs a single unsharded connection.
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0"))
+SHARD_IDS = os.getenv("SHARD_IDS", "")
 
 
-def keep_alive():
-  server = Thread(target=run)
-  server.start()
+def parse_shard_ids(text):
+  """Parse "0-3,6" into [0, 1, 2, 3, 6]; an empty string means every shard (None)."""
+  shard_ids = []
+  for part in text.replace(" ", "").split(","):
+    if not part:
+      continue
+    first, _, last = part.partition("-")
+    shard_ids.extend(range(int(first), int(last or first) + 1))
+  return sorted(set(shard_ids)) or None
 
 
-TOKEN = os.getenv("TOKEN")
-
 intents = discord.Intents.default()
 intents.message_content = True
 intents.voice_states = True  # Needed for voice channel events
 intents.reactions = True  # Required for reaction events
-bot = commands.Bot(command_prefix='!', intents=intents)
+if SHARD_COUNT > 0:
+  bot = commands.AutoShardedBot(
+    command_prefix='!', intents=intents, shard_count=SHARD_COUNT, shard_ids=parse_shard_ids(SHARD_IDS)
+  )
+else:
+  bot = commands.Bot(command_prefix='!', intents=intents)
+
+# Health, readiness and Prometheus metrics endpoint, served from the bot's own event loop
+health_server = HealthServer(bot, host=HEALTH_HOST, port=HEALTH_PORT)
+
+# Active paginated !list messages: message id -> current page and author. Entries expire after
+# 15 minutes without navigation so the map does not grow with every !list.
+active_list_messages = ExpiringDict(ttl=15 * 60, max_size=1000)
+
+# Pages of the country list shared by every paginated message, rebuilt when the cog reloads the country data
+list_pages = None
+list_pages_signature = None
+
+
+def build_list_pages(lines):
+  """Split country list lines into code-block pages that fit in a Discord message."""
+  lines_per_page = 15  # Number of lines per page
+  pages = []
+  current_page_content = ""
+  current_line_count = 0
+
+  for line in lines:
+    if len(current_page_content) + len(line) + 100 > 1900 or current_line_count >= lines_per_page:
+      if current_page_content: # Ensure not adding empty initial page
+        pages.append(f"```\n{current_page_content.strip()}\n```")
+      current_page_content = ""
+      current_line_count = 0
+
+    current_page_content += line
+    current_line_count += 1
+
+  if current_page_content.strip(): # Add the last page if it has content
+    pages.append(f"```\n{current_page_content.strip()}\n```")
+  return pages
+
+
+def current_list_pages():
+  """Pages for the cog's current country data snapshot (countries.txt itself until the cog is loaded)."""
+  global list_pages, list_pages_signature
+  cog = bot.get_cog("CountryGuesser")
+  signature = cog.country_data.signature if cog is not None else "countries.txt"
+  if list_pages is None or signature != list_pages_signature:
+    if cog is not None:
+      lines = [f"{name}\t{code.upper()}\n" for code, name in cog.country_data.code_to_name.items()]
+    else:
+      with open('countries.txt', 'r') as f:
+        lines = f.readlines()
+    list_pages = build_list_pages(lines)
+    list_pages_signature = signature
+  return list_pages
 
-# Global dictionary to store active paginated messages for the !list command
-active_list_messages = {}
 
 @bot.event
 async def on_ready():
@@ -61,30 +114,7 @@ async def on_message(message):
     
     if content_lower == '!list':
         try:
-            with open('countries.txt', 'r') as f:
-                lines = f.readlines()
-            
-            if not lines:
-                await message.channel.send("The countries list is empty.")
-                return
-
-            lines_per_page = 15  # Number of lines per page
-            pages = []
-            current_page_content = ""
-            current_line_count = 0
-
-            for line in lines:
-                if len(current_page_content) + len(line) + 100 > 1900 or current_line_count >= lines_per_page:
-                    if current_page_content: # Ensure not adding empty initial page
-                        pages.append(f"```\n{current_page_content.strip()}\n```")
-                    current_page_content = ""
-                    current_line_count = 0
-                
-                current_page_content += line
-                current_line_count += 1
-            
-            if current_page_content.strip(): # Add the last page if it has content
-                pages.append(f"```\n{current_page_content.strip()}\n```")
+            pages = current_list_pages()
 
             if not pages:
                  await message.channel.send("The countries list is empty or could not be paginated.")
@@ -96,7 +126,6 @@ async def on_message(message):
 
             if len(pages) > 1:
                 active_list_messages[sent_message.id] = {
-                    'pages': pages,
                     'current_index': current_page_index,
                     'author_id': message.author.id # Store original author to restrict control if needed
                 }
@@ -118,6 +147,7 @@ async def on_message(message):
 `!g` - Start a street view guessing game (shows North, East, South, West views)
 `!hint` - Get an extra hint for the guessing game (shows a random view), hint
 `!stop_g` - Stop the current game.
+`!leaderboard` - Show this server's top players (`wins`, `streak` or `fastest`)
 `!eu` - Displays a map of Europe and beyond showing incorrectly guessed countries
 `!as` - Displays a map of Asia and beyond showing incorrectly guessed countries
 `!af` - Displays a map of Africa and beyond showing incorrectly guessed countries
@@ -133,10 +163,10 @@ async def on_reaction_add(reaction, user):
     if user.bot: # Ignore reactions from the bot itself
         return
 
-    if reaction.message.id in active_list_messages:
-        message_data = active_list_messages[reaction.message.id]
-        pages = message_data['pages']
-        current_index = message_data['current_index']
+    message_data = active_list_messages.get(reaction.message.id)
+    if message_data is not None and list_pages:
+        pages = current_list_pages()  # a reload may have changed the page count since the message was sent
+        current_index = min(message_data['current_index'], len(pages) - 1)
         # Optional: Check if reaction.user.id == message_data['author_id'] to restrict to original user
 
         new_index = current_index
@@ -149,6 +179,7 @@ async def on_reaction_add(reaction, user):
 
         if new_index != current_index:
             message_data['current_index'] = new_index
+            active_list_messages[reaction.message.id] = message_data  # Navigation keeps the paginator alive
             page_content_to_send = f"**Page {new_index + 1}/{len(pages)}**\n{pages[new_index]}"
             await reaction.message.edit(content=page_content_to_send)
         
@@ -162,6 +193,15 @@ async def on_reaction_add(reaction, user):
             # Reaction might have been removed by someone else already
             pass
 
+async def main():
+  discord.utils.setup_logging()
+  async with bot:
+    await health_server.start()
+    try:
+      await bot.start(TOKEN)
+    finally:
+      await health_server.stop()
+
+
 if __name__ == '__main__':
-  keep_alive()
-  bot.run(TOKEN)
\ No newline at end of file
+  asyncio.run(main())
@@ -0,0 +1,192 @@
+import io
+import json
+import os
+
+import numpy as np
+
+from geo import load_world_gdf
+
+
+# continent key -> (continents.json key, display name, plotly scope, fit bounds to the countries)
+CONTINENTS = {
+    "eu": ("Europe", "Europe", "europe", False),
+    "as": ("Asia", "Asia", "asia", False),
+    "af": ("Africa", "Africa", "africa", False),
+    "am": ("America", "The Americas", "world", True),
+}
+
+
+# Simplification tolerance in degrees; invisible at the 1200x900 render size
+MAP_SIMPLIFY_TOLERANCE = float(os.getenv("MAP_SIMPLIFY_TOLERANCE", "0.05"))
+
+
+class MapRenderError(Exception):
+    """Raised by the worker when a map cannot be drawn; the message is shown to the user."""
+
+
+_world_loaded = False
+_continent_codes = {}
+_continent_shapes = {}  # continent key -> (ISO_A2 codes as a pandas Series, GeoJSON dict keyed by properties.iso)
+
+
+def build_continent_shapes(world_gdf, continent_codes, tolerance=MAP_SIMPLIFY_TOLERANCE):
+    """Precompute one compact, simplified GeoJSON per continent: a feature per country with only its ISO_A2 code."""
+    codes = world_gdf["ISO_A2"].astype(str).str.lower()
+    shapes = {}
+    for key, country_codes in continent_codes.items():
+        frame = world_gdf.loc[codes.isin(country_codes), ["geometry"]].assign(iso=codes)
+        if frame.empty:
+            continue
+        # One feature per country (map units such as Belgium's regions are merged), simplified without breaking rings.
+        frame = frame.dissolve(by="iso").reset_index()
+        frame["geometry"] = frame.geometry.simplify(tolerance, preserve_topology=True)
+        shapes[key] = (frame["iso"], json.loads(frame.to_json(drop_id=True)))
+    return shapes
+
+
+def init_worker(geojson_path, continents_path):
+    """Process pool initializer: load the continent lists and precompute the per-continent shapes once per worker."""
+    global _world_loaded, _continent_codes, _continent_shapes
+    try:
+        with open(continents_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        _continent_codes = {
+            key: [code.lower() for code in data.get(json_key, [])]
+            for key, (json_key, _, _, _) in CONTINENTS.items()
+        }
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Map worker could not load continents.json: {e}")
+    try:
+        world_gdf = load_world_gdf(geojson_path)
+        _continent_shapes = build_continent_shapes(world_gdf, _continent_codes)
+        _world_loaded = True
+    except Exception as e:
+        print(f"Map worker could not load world GeoJSON: {e}")
+    # Pay for the plotly import while the worker warms up, not on the first map request.
+    import plotly.express  # noqa: F401
+
+
+def warm_up():
+    """No-op task used to start worker processes (and run their initializer) ahead of the first map."""
+    return _world_loaded
+
+
+def render_continent_map(continent_key, incorrect_codes, footer_text_status):
+    """Render a continent choropleth highlighting incorrect guesses and return the PNG bytes."""
+    # Imported here so the bot process, which only needs CONTINENTS, never loads plotly.
+    import plotly.express as px
+    import plotly.io as pio
+
+    _, continent_name_display, plotly_map_scope, auto_fit_bounds = CONTINENTS[continent_key]
+    specific_country_codes = _continent_codes.get(continent_key)
+
+    if not _world_loaded:
+        raise MapRenderError("Sorry, the world map data couldn't be loaded. Map visualization is unavailable.")
+
+    if not specific_country_codes:
+        raise MapRenderError(f"No country data loaded for {continent_name_display}. Cannot generate map.")
+
+    if continent_key not in _continent_shapes:
+        raise MapRenderError(f"No map data found for countries listed under {continent_name_display}. "
+                             f"Ensure `continents.json` and GeoJSON data are correct and include these countries.")
+
+    iso_codes, continent_geojson = _continent_shapes[continent_key]
+    status = np.where(iso_codes.isin(incorrect_codes), "Incorrect Guess", "Not Guessed")
+
+    map_title = f"{continent_name_display} Map"
+
+    fig = px.choropleth(
+        geojson=continent_geojson,
+        locations=iso_codes,
+        featureidkey="properties.iso",
+        color=status,
+        color_discrete_map={
+            'Incorrect Guess': '#FF4757', # Modern red
+            'Not Guessed': '#57606F'       # Sophisticated dark gray
+        },
+        scope=plotly_map_scope,
+        labels={'color': 'Country Status'},
+        title=map_title
+    )
+
+    fig.update_geos(
+        showcoastlines=True,
+        coastlinecolor="#2C3E50",
+        coastlinewidth=1.5,
+        showland=True,
+        landcolor="#ECEFF1",
+        showocean=True,
+        oceancolor="#E3F2FD",
+        showlakes=True,
+        lakecolor="#E1F5FE",
+        showrivers=True,
+        rivercolor="#81D4FA",
+        riverwidth=0.5,
+        showcountries=True,
+        countrycolor="#BDBDBD",
+        countrywidth=0.8,
+        projection_type="natural earth"
+    )
+
+    if auto_fit_bounds and plotly_map_scope == "world":
+        fig.update_geos(fitbounds="locations", visible=True)
+
+    fig.update_layout(
+        height=900,
+        width=1200,
+        margin={"r":20,"t":80,"l":20,"b":20},
+        title={
+            'text': map_title,
+            'x': 0.5,
+            'xanchor': 'center',
+            'font': {
+                'size': 24,
+                'family': 'Arial, sans-serif',
+                'color': '#2C3E50'
+            }
+        },
+        font=dict(
+            family="Arial, sans-serif",
+            size=14,
+            color="#2C3E50"
+        ),
+        paper_bgcolor="#FAFAFA",
+        plot_bgcolor="#FAFAFA",
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=-0.1,
+            xanchor="center",
+            x=0.5,
+            bgcolor="rgba(255,255,255,0.8)",
+            bordercolor="#BDBDBD",
+            borderwidth=1,
+            font=dict(size=12)
+        )
+    )
+
+    fig.update_layout(
+        annotations=[
+            dict(
+                x=0.02,
+                y=0.02,
+                xref="paper",
+                yref="paper",
+                text=f"<b style='color:#2C3E50;'>{footer_text_status}</b>",
+                showarrow=False,
+                font=dict(
+                    size=16,
+                    family="Arial, sans-serif",
+                    color="#2C3E50"
+                ),
+                bgcolor="rgba(255,255,255,0.9)",
+                bordercolor="#BDBDBD",
+                borderwidth=1,
+                borderpad=8
+            )
+        ]
+    )
+
+    img_bytes = io.BytesIO()
+    pio.write_image(fig, img_bytes, format="png", width=1200, height=900, scale=2)
+    return img_bytes.getvalue()
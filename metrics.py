@@ -0,0 +1,154 @@
+import bisect
+import time
+
+
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def labels(self, *labelvalues):
+        """Bind label values, e.g. ``SEARCH_PROBES.labels("hit").inc()``."""
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return _Bound(self, tuple(str(value) for value in labelvalues))
+
+    def _label_text(self, labelvalues, extra=()):
+        pairs = list(zip(self.labelnames, labelvalues)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {} if self.labelnames else {(): 0}
+
+    def inc(self, amount=1, _labelvalues=()):
+        self._values[_labelvalues] = self._values.get(_labelvalues, 0) + amount
+
+    def _samples(self):
+        return [f"{self.name}{self._label_text(labels)} {value}" for labels, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, documentation):
+        super().__init__(name, documentation)
+        self._value = 0
+        self._function = None
+
+    def set(self, value):
+        self._value = value
+
+    def set_function(self, function):
+        """Compute the value when scraped instead of storing it."""
+        self._function = function
+
+    def _samples(self):
+        value = self._function() if self._function is not None else self._value
+        return [f"{self.name} {value}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+    DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [per-bucket counts, count, sum]
+
+    def observe(self, value, _labelvalues=()):
+        series = self._series.get(_labelvalues)
+        if series is None:
+            series = self._series[_labelvalues] = [[0] * len(self.buckets), 0, 0.0]
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[0][index] += 1
+        series[1] += 1
+        series[2] += value
+
+    def time(self, _labelvalues=()):
+        return _Timer(self, _labelvalues)
+
+    def _samples(self):
+        lines = []
+        for labels, (bucket_counts, count, total) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{self._label_text(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_bucket{self._label_text(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_count{self._label_text(labels)} {count}")
+            lines.append(f"{self.name}_sum{self._label_text(labels)} {total}")
+        return lines
+
+
+class _Bound:
+    def __init__(self, metric, labelvalues):
+        self._metric = metric
+        self._labelvalues = labelvalues
+
+    def inc(self, amount=1):
+        self._metric.inc(amount, self._labelvalues)
+
+    def observe(self, value):
+        self._metric.observe(value, self._labelvalues)
+
+    def time(self):
+        return _Timer(self._metric, self._labelvalues)
+
+
+class _Timer:
+    def __init__(self, histogram, labelvalues):
+        self._histogram = histogram
+        self._labelvalues = labelvalues
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(time.perf_counter() - self._start, self._labelvalues)
+
+
+def render_metrics():
+    """Every registered metric in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+GAME_STARTS = Counter("countryguesser_game_starts_total", "Games started with !g.")
+SEARCH_PROBES = Counter(
+    "countryguesser_search_probes_total", "Street View candidate probes by outcome.", ["outcome"]
+)
+GOOGLE_API_SECONDS = Histogram(
+    "countryguesser_google_api_request_seconds", "Latency of Google Maps API requests.", ["endpoint"]
+)
+MAP_RENDER_SECONDS = Histogram(
+    "countryguesser_map_render_seconds", "Continent map render time, including time queued for a worker.",
+    buckets=(0.5, 1, 2, 3, 5, 8, 13, 20, 30, 60),
+)
+ACTIVE_GAMES = Gauge("countryguesser_active_games", "Games currently in progress.")
+EVENT_LOOP_LAG = Gauge("countryguesser_event_loop_lag_seconds", "Latest measured event loop scheduling delay.")
+GOOGLE_API_SPEND = Gauge("countryguesser_google_api_spend_usd", "Estimated Google API spend today (UTC).")
@@ -0,0 +1,134 @@
+import asyncio
+import heapq
+import itertools
+
+import discord
+
+
+# Lower values are sent first
+PRIORITY_RESULT = 0  # guess results, game over and stop announcements
+PRIORITY_GAME = 1    # game start views
+PRIORITY_HINT = 2    # extra hint views
+
+MAX_EMBEDS_PER_MESSAGE = 10  # Discord limit
+
+
+class _Outgoing:
+    __slots__ = ("priority", "sequence", "content", "embeds", "kwargs", "futures")
+
+    def __init__(self, priority, sequence, content, embeds, kwargs, future):
+        self.priority = priority
+        self.sequence = sequence
+        self.content = content
+        self.embeds = list(embeds)
+        self.kwargs = kwargs
+        self.futures = [future]
+
+    def __lt__(self, other):
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+    def can_absorb(self, other):
+        """Plain embed-only messages of the same priority can share one Discord message."""
+        return (
+            self.priority == other.priority
+            and not self.content and not other.content
+            and not self.kwargs and not other.kwargs
+            and len(self.embeds) + len(other.embeds) <= MAX_EMBEDS_PER_MESSAGE
+        )
+
+
+class _ChannelQueue:
+    def __init__(self, channel):
+        self.channel = channel
+        self.heap = []
+        self.wakeup = asyncio.Event()
+        self.worker = None
+
+
+class OutboundSender:
+    """Per-channel outbound message queue with priorities and embed coalescing.
+
+    Each channel gets one worker that sends queued messages in priority order,
+    so a guess result is never stuck behind hint images, and merges adjacent
+    embed-only messages of the same priority into a single multi-embed message.
+    When Discord answers 429 the worker waits out ``retry_after`` and retries.
+    Idle workers exit after ``idle_timeout`` seconds.
+    """
+
+    def __init__(self, idle_timeout=60.0, max_retries=3):
+        self.idle_timeout = idle_timeout
+        self.max_retries = max_retries
+        self._channels = {}
+        self._sequence = itertools.count()
+
+    async def send(self, channel, content=None, *, embed=None, embeds=(), priority=PRIORITY_GAME, **kwargs):
+        """Queue a message for the channel and wait until it is sent; returns the discord.Message."""
+        if embed is not None:
+            embeds = [embed, *embeds]
+        future = asyncio.get_running_loop().create_future()
+        queue = self._channels.get(channel.id)
+        if queue is None:
+            queue = self._channels[channel.id] = _ChannelQueue(channel)
+        heapq.heappush(queue.heap, _Outgoing(priority, next(self._sequence), content, embeds, kwargs, future))
+        queue.wakeup.set()
+        if queue.worker is None or queue.worker.done():
+            queue.worker = asyncio.create_task(self._run(channel.id, queue))
+        return await future
+
+    async def close(self):
+        for queue in list(self._channels.values()):
+            if queue.worker is not None:
+                queue.worker.cancel()
+            for outgoing in queue.heap:
+                for future in outgoing.futures:
+                    if not future.done():
+                        future.cancel()
+        self._channels.clear()
+
+    def _next_batch(self, queue):
+        outgoing = heapq.heappop(queue.heap)
+        while queue.heap and outgoing.can_absorb(queue.heap[0]):
+            following = heapq.heappop(queue.heap)
+            outgoing.embeds.extend(following.embeds)
+            outgoing.futures.extend(following.futures)
+        return outgoing
+
+    async def _deliver(self, channel, outgoing):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await channel.send(outgoing.content, embeds=outgoing.embeds or None, **outgoing.kwargs)
+            except discord.HTTPException as e:
+                if e.status != 429 or attempt == self.max_retries:
+                    raise
+                retry_after = getattr(e, "retry_after", None) or 1.0
+                print(f"Rate limited sending to channel {channel.id}; retrying in {retry_after:.1f}s.")
+                await asyncio.sleep(retry_after)
+
+    async def _run(self, channel_id, queue):
+        while True:
+            if not queue.heap:
+                queue.wakeup.clear()
+                try:
+                    await asyncio.wait_for(queue.wakeup.wait(), timeout=self.idle_timeout)
+                except asyncio.TimeoutError:
+                    if not queue.heap:
+                        if self._channels.get(channel_id) is queue:
+                            del self._channels[channel_id]
+                        return
+                    continue
+
+            outgoing = self._next_batch(queue)
+            try:
+                message = await self._deliver(queue.channel, outgoing)
+            except asyncio.CancelledError:
+                for future in outgoing.futures:
+                    future.cancel()
+                raise
+            except Exception as e:
+                for future in outgoing.futures:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for future in outgoing.futures:
+                if not future.done():
+                    future.set_result(message)
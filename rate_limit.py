@@ -0,0 +1,194 @@
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import time
+
+from storage import read_json, write_json_atomic
+
+
+PRIORITY_USER = 0        # a player is waiting on the result (!g, hint)
+PRIORITY_BACKGROUND = 1  # pool refills and other prefetching
+
+# Approximate Google Maps Platform list prices in USD per request; metadata requests are free.
+DEFAULT_COSTS = {
+    "streetview_metadata": 0.0,
+    "streetview_image": 0.007,
+    "geocode": 0.005,
+}
+
+_priority = contextvars.ContextVar("api_priority", default=PRIORITY_USER)
+
+
+def current_priority():
+    return _priority.get()
+
+
+@contextlib.contextmanager
+def background_priority():
+    """Run the enclosed API calls (and tasks created inside) at background priority."""
+    token = _priority.set(PRIORITY_BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class BudgetExhausted(Exception):
+    """The daily API budget does not allow another call at this priority."""
+
+
+def _today():
+    return time.strftime("%Y-%m-%d", time.gmtime())
+
+
+class ApiRateLimiter:
+    """Token bucket shared by every Google API call, with a daily cost budget.
+
+    ``acquire`` waits for a token; when calls queue up, user-facing ones are
+    served before background ones. Each call is charged its endpoint's cost
+    against ``daily_budget`` (USD, reset at midnight UTC; 0 disables it).
+    Background calls stop once ``background_share`` of the budget is spent so
+    the rest stays available to players. The budget is checked when a call is
+    granted its token, so calls queued during a burst cannot overshoot it;
+    a paid call that would take the spend past its priority's limit raises
+    BudgetExhausted instead. When several processes share
+    the budget, ``shared_spent`` holds the others' spend for today and counts
+    against it too.
+    """
+
+    def __init__(self, rate, burst, daily_budget=0.0, background_share=0.8, costs=None, path=None):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.daily_budget = daily_budget
+        self.background_share = background_share
+        self.costs = dict(DEFAULT_COSTS if costs is None else costs)
+        self.path = path
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._waiters = []  # heap of (priority, sequence, endpoint, future)
+        self._sequence = itertools.count()
+        self._dispatcher = None
+        self._day = _today()
+        self._spent = 0.0
+        self._calls = {}
+        self.shared_spent = 0.0
+
+    def _roll_day(self):
+        today = _today()
+        if today != self._day:
+            self._day = today
+            self._spent = 0.0
+            self._calls = {}
+            self.shared_spent = 0.0
+
+    def _limit_for(self, priority):
+        if priority == PRIORITY_BACKGROUND:
+            return self.daily_budget * self.background_share
+        return self.daily_budget
+
+    def budget_exhausted(self, priority=None):
+        """True when paid calls at this priority (default: the caller's) are over today's budget."""
+        if self.daily_budget <= 0:
+            return False
+        self._roll_day()
+        return self._spent + self.shared_spent >= self._limit_for(current_priority() if priority is None else priority)
+
+    def _can_afford(self, priority, cost):
+        if not cost or self.daily_budget <= 0:
+            return True
+        self._roll_day()
+        # A little slack so that e.g. four 0.005 calls fit a 0.02 budget despite float rounding.
+        return self._spent + self.shared_spent + cost <= self._limit_for(priority) + 1e-9
+
+    def _grant(self, priority, endpoint):
+        """Take a token for the call and charge it, or raise BudgetExhausted without taking one."""
+        cost = self.costs.get(endpoint, 0.0)
+        if not self._can_afford(priority, cost):
+            raise BudgetExhausted(f"Daily Google API budget exhausted ({self.spent_today():.3f}/{self.daily_budget:.2f} USD)")
+        self._tokens -= 1
+        self._spent += cost
+        self._calls[endpoint] = self._calls.get(endpoint, 0) + 1
+
+    def spent_today(self):
+        """Today's spend across every process sharing the budget."""
+        self._roll_day()
+        return self._spent + self.shared_spent
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, endpoint):
+        """Wait for a token for one call to the endpoint and charge its cost."""
+        priority = current_priority()
+        if not self._can_afford(priority, self.costs.get(endpoint, 0.0)):
+            raise BudgetExhausted(f"Daily Google API budget exhausted ({self.spent_today():.3f}/{self.daily_budget:.2f} USD)")
+
+        self._refill()
+        if not self._waiters and self._tokens >= 1:
+            self._grant(priority, endpoint)
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), endpoint, future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future  # resolved by _dispatch once the call is granted (and charged) or refused
+
+    def charge(self, endpoint, count=1):
+        """Count calls made on our behalf without a token, e.g. Static API URLs that Discord fetches.
+
+        Returns False, charging nothing, when the caller's budget does not
+        cover them; the caller must then not hand the URLs out.
+        """
+        if not self._can_afford(current_priority(), self.costs.get(endpoint, 0.0) * count):
+            return False
+        self._spent += self.costs.get(endpoint, 0.0) * count
+        self._calls[endpoint] = self._calls.get(endpoint, 0) + count
+        return True
+
+    async def _dispatch(self):
+        while self._waiters:
+            self._refill()
+            while self._waiters and self._tokens >= 1:
+                priority, _, endpoint, future = heapq.heappop(self._waiters)
+                if future.done():  # the caller was cancelled while queued
+                    continue
+                try:
+                    self._grant(priority, endpoint)
+                except BudgetExhausted as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(None)
+            if self._waiters:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def status(self):
+        self._roll_day()
+        return {
+            "day": self._day,
+            "spent": self._spent,
+            "shared_spent": self.shared_spent,
+            "daily_budget": self.daily_budget,
+            "calls": dict(self._calls),
+            "queued": sum(1 for *_, future in self._waiters if not future.done()),
+        }
+
+    def load(self):
+        data = read_json(self.path, "API budget")
+        if data is not None and data.get("day") == _today():
+            self._day = data["day"]
+            self._spent = float(data.get("spent", 0.0))
+            self._calls = dict(data.get("calls", {}))
+            print(f"Restored today's Google API spend: {self._spent:.2f} USD.")
+
+    def snapshot(self):
+        return {"day": self._day, "spent": self._spent, "calls": dict(self._calls)}
+
+    def save(self, snapshot=None):
+        """Write today's spend to disk atomically; pass a snapshot when calling from another thread."""
+        if not self.path:
+            return
+        write_json_atomic(self.path, snapshot if snapshot is not None else self.snapshot())
@@ -0,0 +1,147 @@
+import json
+import math
+
+from storage import read_json, write_json_atomic
+
+
+def _new_country_stats():
+    return {
+        "searches": 0,
+        "successes": 0,
+        "probes": 0,
+        "wrong_country": 0,
+        "radius": {},
+        "sampler": {},
+    }
+
+
+class SearchStats:
+    """Per-country outcomes of Street View searches, used to tune later searches.
+
+    Every probe is recorded with the radius and sampler that produced it and
+    one of the outcomes "hit" (panorama inside the country), "wrong_country",
+    "no_pano" or "unknown" (country could not be determined). From these the
+    stats suggest a radius order and an attempt budget per country, and they
+    can be saved to and loaded from a JSON file.
+    """
+
+    OUTCOMES = ("hit", "wrong_country", "no_pano", "unknown")
+
+    def __init__(self, path=None, min_budget=10, max_budget=60):
+        self.path = path
+        self.min_budget = min_budget
+        self.max_budget = max_budget
+        self._countries = {}
+
+    def _country(self, country_code):
+        return self._countries.setdefault(country_code.lower(), _new_country_stats())
+
+    def record_probe(self, country_code, sampler, radius, outcome):
+        if outcome not in self.OUTCOMES:
+            raise ValueError(f"Unknown probe outcome: {outcome}")
+        stats = self._country(country_code)
+        hit = outcome == "hit"
+        stats["probes"] += 1
+        if outcome == "wrong_country":
+            stats["wrong_country"] += 1
+        for bucket in (stats["radius"].setdefault(str(radius), {"probes": 0, "hits": 0}),
+                       stats["sampler"].setdefault(sampler, {"probes": 0, "hits": 0})):
+            bucket["probes"] += 1
+            if hit:
+                bucket["hits"] += 1
+
+    def record_search(self, country_code, success):
+        stats = self._country(country_code)
+        stats["searches"] += 1
+        if success:
+            stats["successes"] += 1
+
+    def attempts_per_success(self, country_code):
+        stats = self._countries.get(country_code.lower())
+        if not stats or not stats["successes"]:
+            return None
+        return stats["probes"] / stats["successes"]
+
+    def wrong_country_rate(self, country_code):
+        """Share of found panoramas that turned out to be in another country."""
+        stats = self._countries.get(country_code.lower())
+        if not stats:
+            return None
+        hits = sum(bucket["hits"] for bucket in stats["radius"].values())
+        found = hits + stats["wrong_country"]
+        return stats["wrong_country"] / found if found else None
+
+    def radius_order(self, country_code, radii):
+        """Order radii by their smoothed success rate for the country; unseen countries keep the given order."""
+        stats = self._countries.get(country_code.lower())
+        if not stats:
+            return list(radii)
+
+        def success_rate(radius):
+            bucket = stats["radius"].get(str(radius), {"probes": 0, "hits": 0})
+            return (bucket["hits"] + 1) / (bucket["probes"] + 2)
+
+        return sorted(radii, key=success_rate, reverse=True)
+
+    def attempt_budget(self, country_code, default):
+        """Allow roughly three times the observed attempts per success, within the configured bounds."""
+        stats = self._countries.get(country_code.lower())
+        if not stats or stats["searches"] < 3:
+            return default
+        if not stats["successes"]:
+            return self.max_budget
+        budget = math.ceil(3 * stats["probes"] / stats["successes"])
+        return max(self.min_budget, min(self.max_budget, budget))
+
+    def hit_rates(self):
+        """Return {country_code: {sampler: (hits, probes)}} for every country probed so far."""
+        return {
+            country_code: {sampler: (bucket["hits"], bucket["probes"]) for sampler, bucket in stats["sampler"].items()}
+            for country_code, stats in self._countries.items()
+            if stats["sampler"]
+        }
+
+    def summary_lines(self):
+        """Human-readable per-country lines, most expensive (attempts per success) first."""
+        def cost(country_code):
+            aps = self.attempts_per_success(country_code)
+            return aps if aps is not None else math.inf
+
+        lines = []
+        for country_code in sorted(self._countries, key=cost, reverse=True):
+            stats = self._countries[country_code]
+            aps = self.attempts_per_success(country_code)
+            wrong_rate = self.wrong_country_rate(country_code)
+            radius_parts = " ".join(
+                f"{int(radius) // 1000}km:{bucket['hits']}/{bucket['probes']}"
+                for radius, bucket in sorted(stats["radius"].items(), key=lambda item: int(item[0]))
+            )
+            sampler_parts = " ".join(
+                f"{sampler}:{bucket['hits']}/{bucket['probes']}" for sampler, bucket in sorted(stats["sampler"].items())
+            )
+            lines.append(
+                f"{country_code.upper()} {stats['successes']}/{stats['searches']} searches, "
+                f"{f'{aps:.1f}' if aps is not None else '-'} att/success, "
+                f"wrong {f'{wrong_rate:.0%}' if wrong_rate is not None else '-'} | {radius_parts} | {sampler_parts}"
+            )
+        return lines
+
+    def load(self):
+        data = read_json(self.path, "search stats")
+        if data is None:
+            return
+        for country_code, stats in data.items():
+            merged = _new_country_stats()
+            merged.update(stats)
+            self._countries[country_code] = merged
+        print(f"Loaded search stats for {len(self._countries)} countries.")
+
+    def snapshot(self):
+        """Deep copy of the counters that can be serialized off the event loop."""
+        return json.loads(json.dumps(self._countries))
+
+    def save(self, snapshot=None):
+        """Write counters to disk atomically; pass a snapshot when calling from another thread."""
+        if not self.path:
+            return
+        write_json_atomic(self.path, snapshot if snapshot is not None else self.snapshot())
@@ -0,0 +1,113 @@
+import json
+import sqlite3
+import time
+
+from storage import SQLiteThread
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS api_spend (
+    day TEXT NOT NULL,
+    process_key TEXT NOT NULL,
+    spent REAL NOT NULL,
+    calls TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (day, process_key)
+);
+CREATE TABLE IF NOT EXISTS maps (
+    key TEXT PRIMARY KEY,
+    png BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_maps_created ON maps (created_at);
+"""
+
+
+class SharedState:
+    """SQLite (WAL) database shared by the bot processes of a sharded deployment (see supervisor.py).
+
+    It holds what would otherwise be duplicated in every process: rendered
+    map PNGs, bounded to ``map_cache_max_bytes`` with the oldest dropped
+    first, and each process's Google API spend for the day, so the daily
+    budget covers all processes together. Validated panoramas are shared
+    through the location cache database, which every process opens.
+    Queries run on the state's own thread so the event loop never waits on
+    SQLite locks held by another process.
+    """
+
+    def __init__(self, path, process_key, map_cache_max_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.process_key = process_key
+        self.map_cache_max_bytes = map_cache_max_bytes
+        self._db = SQLiteThread(path, "shared-state")
+
+    async def open(self):
+        try:
+            await self._db.open(_SCHEMA)
+        except sqlite3.Error as e:
+            print(f"Error opening shared state {self.path}: {e}. Maps and API spend will not be shared.")
+            return
+        print(f"Sharing maps and API spend through {self.path} as {self.process_key}.")
+
+    async def close(self):
+        await self._db.close()
+
+    async def _run(self, fn, *args, default=None):
+        if self._db.conn is None:
+            return default
+        try:
+            return await self._db.run(fn, *args)
+        except sqlite3.Error as e:
+            print(f"Shared state query failed: {e}")
+            return default
+
+    async def sync_spend(self, snapshot):
+        """Publish this process's spend snapshot (see ApiRateLimiter.snapshot) and return the other processes' spend for that day."""
+        return await self._run(self._sync_spend, snapshot, default=0.0)
+
+    async def get_map(self, key):
+        return await self._run(self._get_map, key)
+
+    async def put_map(self, key, png_bytes):
+        if len(png_bytes) <= self.map_cache_max_bytes:
+            await self._run(self._put_map, key, png_bytes)
+
+    # The methods below run on the database thread only.
+
+    def _sync_spend(self, snapshot):
+        with self._db.conn:
+            self._db.conn.execute(
+                "INSERT OR REPLACE INTO api_spend (day, process_key, spent, calls, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (snapshot["day"], self.process_key, snapshot["spent"], json.dumps(snapshot["calls"]), time.time()),
+            )
+            self._db.conn.execute("DELETE FROM api_spend WHERE day < ?", (snapshot["day"],))
+        row = self._db.conn.execute(
+            "SELECT COALESCE(SUM(spent), 0) FROM api_spend WHERE day = ? AND process_key != ?",
+            (snapshot["day"], self.process_key),
+        ).fetchone()
+        return float(row[0])
+
+    def _get_map(self, key):
+        row = self._db.conn.execute("SELECT png FROM maps WHERE key = ?", (key,)).fetchone()
+        return bytes(row[0]) if row is not None else None
+
+    def _put_map(self, key, png_bytes):
+        with self._db.conn:
+            self._db.conn.execute(
+                "INSERT OR REPLACE INTO maps (key, png, size, created_at) VALUES (?, ?, ?, ?)",
+                (key, png_bytes, len(png_bytes), time.time()),
+            )
+            total = self._db.conn.execute("SELECT COALESCE(SUM(size), 0) FROM maps").fetchone()[0]
+            if total > self.map_cache_max_bytes:
+                # Drop the oldest maps until the rest fit.
+                self._db.conn.execute(
+                    """
+                    DELETE FROM maps WHERE key IN (
+                        SELECT key FROM (
+                            SELECT key, SUM(size) OVER (ORDER BY created_at DESC) AS kept FROM maps
+                        ) WHERE kept > ?
+                    )
+                    """,
+                    (self.map_cache_max_bytes,),
+                )
@@ -0,0 +1,82 @@
+import asyncio
+import json
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _ensure_parent(path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+def read_json(path, description):
+    """Parsed contents of a JSON file, or None when it is missing or unreadable (reported as ``description``)."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Error loading {description} from {path}: {e}")
+        return None
+
+
+def write_json_atomic(path, data):
+    """Write data as JSON through a temporary file and a rename, so readers never see a partial file."""
+    _ensure_parent(path)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class SQLiteThread:
+    """A SQLite (WAL) connection owned by one dedicated thread.
+
+    Queries go through ``run`` (awaited) or ``submit`` (fire and forget), so
+    they execute in order on that thread and the event loop never waits on
+    SQLite, not even while another process holds a lock. ``conn`` stays None
+    until ``open`` succeeds; functions passed to run/submit may use it.
+    """
+
+    def __init__(self, path, name, timeout=10.0):
+        self.path = path
+        self.timeout = timeout
+        self.conn = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+
+    async def open(self, schema):
+        """Connect and create the schema (a SQL script); raises sqlite3.Error on failure."""
+        await self.run(self._connect, schema)
+
+    async def run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def submit(self, fn, *args):
+        return self._executor.submit(fn, *args)
+
+    async def close(self):
+        await self.run(self._close)
+        self._executor.shutdown(wait=True)
+
+    def _connect(self, schema):
+        _ensure_parent(self.path)
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        try:
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(schema)
+            conn.commit()
+        except sqlite3.Error:
+            conn.close()
+            raise
+        self.conn = conn
+
+    def _close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,52 @@
+import asyncio
+import io
+
+import aiohttp
+from PIL import Image, ImageDraw
+
+import metrics
+from rate_limit import BudgetExhausted
+
+
+TILE_SIZE = (800, 450)  # each heading is downscaled from the 1200x675 Static API image
+LABEL_PADDING = 10
+
+
+async def fetch_image(session, url, limiter=None):
+    """Download one Street View Static API image; returns the bytes or None."""
+    try:
+        if limiter is not None:
+            await limiter.acquire("streetview_image")
+        with metrics.GOOGLE_API_SECONDS.labels("streetview_image").time():
+            async with session.get(url) as response:
+                response.raise_for_status()
+                return await response.read()
+    except BudgetExhausted as e:
+        print(f"Skipping Street View image request: {e}")
+    except asyncio.TimeoutError:
+        print("Street View image request timed out.")
+    except aiohttp.ClientError as e:
+        print(f"Street View image request failed: {e}")
+    return None
+
+
+def compose_grid(images, labels, quality=85):
+    """Stitch four heading images into a labelled 2x2 grid and return it as JPEG bytes.
+
+    CPU-bound; run it in a worker thread.
+    """
+    tile_width, tile_height = TILE_SIZE
+    grid = Image.new("RGB", (tile_width * 2, tile_height * 2))
+    draw = ImageDraw.Draw(grid)
+    for index, (image_bytes, label) in enumerate(zip(images, labels)):
+        with Image.open(io.BytesIO(image_bytes)) as tile:
+            tile = tile.convert("RGB").resize(TILE_SIZE, Image.LANCZOS)
+        x, y = (index % 2) * tile_width, (index // 2) * tile_height
+        grid.paste(tile, (x, y))
+        left, top, right, bottom = draw.textbbox((0, 0), label)
+        box = (x, y, x + right - left + 2 * LABEL_PADDING, y + bottom - top + 2 * LABEL_PADDING)
+        draw.rectangle(box, fill=(0, 0, 0))
+        draw.text((x + LABEL_PADDING, y + LABEL_PADDING - top), label, fill=(255, 255, 255))
+    output = io.BytesIO()
+    grid.save(output, format="JPEG", quality=quality, optimize=True)
+    return output.getvalue()
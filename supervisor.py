@@ -0,0 +1,165 @@
+import argparse
+import asyncio
+import os
+import signal
+import sys
+import time
+
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+MAIN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+
+def shard_ranges(shard_count, processes):
+    """Split shard ids 0..shard_count-1 into contiguous (first, last) ranges, one per process."""
+    processes = max(1, min(processes, shard_count))
+    ranges = []
+    first = 0
+    for index in range(processes):
+        size = shard_count // processes + (1 if index < shard_count % processes else 0)
+        ranges.append((first, first + size - 1))
+        first += size
+    return ranges
+
+
+def per_process_path(path, label):
+    """data/api_budget.json -> data/api_budget.shards-0-3.json, for files each process writes on its own."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{label}{ext}"
+
+
+class ShardProcess:
+    """One main.py process running a range of gateway shards, restarted with backoff when it exits."""
+
+    def __init__(self, label, env, start_delay=0.0, max_backoff=60.0):
+        self.label = label
+        self.env = env
+        self.start_delay = start_delay
+        self.max_backoff = max_backoff
+        self.process = None
+
+    async def _forward_output(self, stream):
+        while True:
+            line = await stream.readline()
+            if not line:
+                return
+            print(f"[{self.label}] {line.decode(errors='replace').rstrip()}", flush=True)
+
+    async def run(self, stopping):
+        try:
+            await asyncio.wait_for(stopping.wait(), timeout=self.start_delay)
+            return
+        except asyncio.TimeoutError:
+            pass
+        backoff = 1.0
+        while not stopping.is_set():
+            started = time.monotonic()
+            self.process = await asyncio.create_subprocess_exec(
+                sys.executable, MAIN_PATH,
+                env=self.env,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+            )
+            print(f"Started {self.label} (pid {self.process.pid}, health port {self.env['HEALTH_PORT']})")
+            await self._forward_output(self.process.stdout)
+            returncode = await self.process.wait()
+            if stopping.is_set():
+                return
+            if time.monotonic() - started > 60:
+                backoff = 1.0  # it ran fine for a while; this is a fresh failure
+            print(f"{self.label} exited with code {returncode}; restarting in {backoff:.0f}s")
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=backoff)
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def terminate(self):
+        if self.process is not None and self.process.returncode is None:
+            self.process.terminate()
+
+    def kill(self):
+        if self.process is not None and self.process.returncode is None:
+            self.process.kill()
+
+
+def build_processes(args):
+    rate = float(os.getenv("GOOGLE_API_RATE_PER_SECOND", "20"))
+    burst = float(os.getenv("GOOGLE_API_BURST", "40"))
+    budget_path = os.getenv("GOOGLE_API_BUDGET_PATH", "data/api_budget.json")
+    stats_path = os.getenv("SEARCH_STATS_PATH", "data/search_stats.json")
+    ranges = shard_ranges(args.shards, args.processes)
+    processes = []
+    delay = 0.0
+    for index, (first, last) in enumerate(ranges):
+        label = f"shards-{first}-{last}"
+        env = dict(os.environ)
+        env.update({
+            "SHARD_COUNT": str(args.shards),
+            "SHARD_IDS": f"{first}-{last}",
+            "HEALTH_PORT": str(args.health_port + index),
+            "SHARED_STATE_PATH": args.shared_state,
+            # Google's quota is per project, so the processes split the rate limit between them.
+            "GOOGLE_API_RATE_PER_SECOND": str(rate / len(ranges)),
+            "GOOGLE_API_BURST": str(max(1.0, burst / len(ranges))),
+            "GOOGLE_API_BUDGET_PATH": per_process_path(budget_path, label),
+            "SEARCH_STATS_PATH": per_process_path(stats_path, label),
+            "PYTHONUNBUFFERED": "1",
+        })
+        processes.append(ShardProcess(label, env, start_delay=delay))
+        # Discord allows one IDENTIFY every 5 seconds per bot; let each process finish its shards first.
+        delay += args.identify_interval * (last - first + 1)
+    return processes
+
+
+async def supervise(args):
+    processes = build_processes(args)
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    runners = [asyncio.create_task(process.run(stopping)) for process in processes]
+    print(f"Supervising {len(processes)} processes for {args.shards} shards.")
+    await stopping.wait()
+
+    print("Stopping shard processes...")
+    for process in processes:
+        process.terminate()
+    _, pending = await asyncio.wait(runners, timeout=args.stop_timeout)
+    if pending:
+        for process in processes:
+            process.kill()
+        await asyncio.wait(pending)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the bot as several gateway shard processes that share the location cache, "
+                    "rendered maps and the Google API budget."
+    )
+    parser.add_argument("--shards", type=int, default=int(os.getenv("SHARD_COUNT") or 2),
+                        help="total number of gateway shards (default: SHARD_COUNT or 2)")
+    parser.add_argument("--processes", type=int, default=int(os.getenv("SHARD_PROCESSES") or 0),
+                        help="number of bot processes the shards are split across (default: one per shard)")
+    parser.add_argument("--shared-state", default=os.getenv("SHARED_STATE_PATH") or "data/shared.sqlite3",
+                        help="SQLite database the processes share maps and API spend through")
+    parser.add_argument("--health-port", type=int, default=int(os.getenv("HEALTH_PORT", "8000")),
+                        help="health port of the first process; the others count up from it")
+    parser.add_argument("--identify-interval", type=float, default=5.0,
+                        help="seconds per shard to wait before starting the next process")
+    parser.add_argument("--stop-timeout", type=float, default=20.0,
+                        help="seconds to wait for processes to exit before killing them")
+    args = parser.parse_args()
+    if args.shards < 1:
+        parser.error("--shards must be at least 1")
+    if args.processes <= 0:
+        args.processes = args.shards
+    asyncio.run(supervise(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import pytest
+
+import caches
+from caches import ExpiringDict
+
+
+def test_expiring_dict_drops_entries_after_ttl(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(caches.time, "monotonic", lambda: now[0])
+    entries = ExpiringDict(ttl=10, max_size=100)
+    entries["a"] = 1
+    now[0] = 5
+    entries["b"] = 2
+    assert entries["a"] == 1 and "b" in entries
+    now[0] = 10
+    assert "a" not in entries
+    assert entries.get("a", "gone") == "gone"
+    with pytest.raises(KeyError):
+        entries["a"]
+    assert len(entries) == 1
+    now[0] = 15
+    assert entries.pop("b") is None
+
+
+def test_expiring_dict_setting_a_key_renews_it_and_evicts_the_oldest(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(caches.time, "monotonic", lambda: now[0])
+    entries = ExpiringDict(ttl=10, max_size=2)
+    entries["a"] = 1
+    now[0] = 1
+    entries["b"] = 2
+    entries["a"] = 3
+    entries["c"] = 4
+    assert "b" not in entries
+    assert entries["a"] == 3 and entries["c"] == 4
@@ -0,0 +1,67 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from country_data import CountryDataWatcher, load_country_data
+
+
+def _write_data_files(directory, countries):
+    paths = tuple(os.path.join(directory, name) for name in (
+        "countries.txt", "country_bounds.txt", "continents.json", "country_aliases.json"))
+    countries_path, bounds_path, continents_path, aliases_path = paths
+    with open(countries_path, "w", encoding="utf-8") as f:
+        f.writelines(f"{name}\t{code}\n" for name, code in countries.items())
+    with open(bounds_path, "w", encoding="utf-8") as f:
+        f.write("# code south west north east\nFR 41.3 -5.2 51.1 9.6\n")
+    with open(continents_path, "w", encoding="utf-8") as f:
+        json.dump({"Europe": [code for code in countries.values()]}, f)
+    with open(aliases_path, "w", encoding="utf-8") as f:
+        json.dump({"FR": {"iso3": "FRA", "aliases": []}}, f)
+    return paths
+
+
+def test_snapshot_tables_are_read_only(tmp_path):
+    data = load_country_data(*_write_data_files(str(tmp_path), {"France": "FR", "Germany": "DE"}))
+    assert data.codes == ("de", "fr")
+    assert data.name_to_code["france"] == "fr"
+    assert data.code_to_name["de"] == "Germany"
+    assert data.bounds["fr"] == (41.3, -5.2, 51.1, 9.6)
+    assert data.continent("Europe") == frozenset({"fr", "de"})
+    assert data.continent("Atlantis") == frozenset()
+    assert data.aliases["fr"]["iso3"] == "FRA"
+    with pytest.raises(TypeError):
+        data.code_to_name["it"] = "Italy"
+
+
+def test_missing_files_give_empty_tables(tmp_path):
+    data = load_country_data(*(str(tmp_path / name) for name in ("a.txt", "b.txt", "c.json", "d.json")))
+    assert data.codes == ()
+    assert data.signature == (None, None, None, None)
+
+
+def test_watcher_swaps_in_a_new_snapshot_when_a_file_changes(tmp_path):
+    paths = _write_data_files(str(tmp_path), {"France": "FR"})
+
+    async def scenario():
+        current = load_country_data(*paths)
+        reloaded = asyncio.Event()
+
+        async def on_reload(data):
+            nonlocal current
+            current = data
+            reloaded.set()
+
+        watcher = CountryDataWatcher(current, on_reload, interval=0.01, paths=paths)
+        watcher.start()
+        old = current
+        _write_data_files(str(tmp_path), {"France": "FR", "Italy": "IT"})
+        await asyncio.wait_for(reloaded.wait(), timeout=5)
+        await watcher.stop()
+        return old, current
+
+    old, new = asyncio.run(scenario())
+    assert old.codes == ("fr",)  # the previous snapshot is left untouched
+    assert new.codes == ("fr", "it")
+    assert new.signature != old.signature
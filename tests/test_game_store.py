@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from game_store import GameStore, _Ranking
+
+
+def test_ranking_keeps_entries_sorted_as_keys_change():
+    ranking = _Ranking()
+    ranking.update(1, (-3, 1))
+    ranking.update(2, (-5, 2))
+    ranking.update(3, (-4, 3))
+    assert ranking.top(2) == [2, 3]
+    ranking.update(1, (-6, 1))
+    ranking.update(2, None)
+    assert ranking.top(10) == [1, 3]
+
+
+def test_a_win_by_someone_else_breaks_the_streak():
+    store = GameStore(":memory:")
+    store.record_win(1, 10, 12.0)
+    store.record_win(1, 10, 8.0)
+    stats = store.record_win(1, 11, 5.0)
+    assert stats["current_streak"] == 1
+    assert store.player(1, 10)["current_streak"] == 0
+    assert store.player(1, 10)["best_streak"] == 2
+    store.record_no_winner(1)
+    assert store.player(1, 11)["current_streak"] == 0
+    assert store.record_win(2, 10, 30.0)["current_streak"] == 1  # streaks are per guild
+
+
+def test_leaderboards_rank_players_within_their_guild():
+    store = GameStore(":memory:")
+    for user_id, seconds in ((10, 9.0), (11, 4.0), (11, 6.0), (12, 7.0), (12, 2.0), (12, 3.0)):
+        store.record_win(1, user_id, seconds)
+    store.record_win(2, 13, 1.0)
+    assert [p["user_id"] for p in store.leaderboard(1, "wins")] == [12, 11, 10]
+    assert [p["user_id"] for p in store.leaderboard(1, "fastest", limit=2)] == [12, 11]
+    assert [p["user_id"] for p in store.leaderboard(1, "streak")] == [12, 11, 10]
+    assert store.leaderboard(3) == []
+    with pytest.raises(ValueError):
+        store.leaderboard(1, "losses")
+
+
+def test_game_store_persists_games_and_stats(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "games.sqlite3")
+        store = GameStore(path)
+        await store.open()
+        store.record_win(1, 10, 4.5)
+        store.set_incorrect_guesses(5, {"fr", "de"})
+        await store.close()
+        reopened = GameStore(path)
+        await reopened.open()
+        await reopened.close()
+        return reopened
+
+    reopened = asyncio.run(scenario())
+    assert reopened.player(1, 10)["fastest_seconds"] == 4.5
+    assert reopened.incorrect_guesses() == {5: {"fr", "de"}}
@@ -0,0 +1,64 @@
+import pytest
+
+from guess_resolver import GuessResolver
+
+
+@pytest.fixture
+def resolver():
+    names = {
+        "France": "fr",
+        "Germany": "de",
+        "Austria": "at",
+        "Australia": "au",
+        "India": "in",
+        "Côte d'Ivoire": "ci",
+        "Bosnia and Herzegovina": "ba",
+        "Iran": "ir",
+        "Iraq": "iq",
+        "Chile": "cl",
+        "Oman": "om",
+        "Spain": "es",
+        "Brazil": "br",
+    }
+    aliases = {
+        "de": {"iso3": "DEU", "aliases": ["Deutschland"]},
+        "ci": {"iso3": "CIV", "aliases": ["Ivory Coast"]},
+        "ad": {"iso3": "AND", "aliases": []},
+        "xx": {"iso3": "XXX", "aliases": ["Nowhere"]},
+    }
+    return GuessResolver(names, aliases)
+
+
+def test_exact_names_codes_and_aliases(resolver):
+    assert resolver.resolve("France") == "fr"
+    assert resolver.resolve("IN") == "in"
+    assert resolver.resolve("deu") == "de"
+    assert resolver.resolve("Deutschland") == "de"
+    assert resolver.resolve("the ivory coast") == "ci"
+    assert resolver.resolve("cote d ivoire") == "ci"
+    assert resolver.resolve("COTE DIVOIRE") == "ci"
+    assert resolver.resolve("Bosnia & Herzegovina") == "ba"
+
+
+def test_excluded_codes_and_unknown_countries_are_not_guesses(resolver):
+    assert resolver.resolve("and") is None
+    assert resolver.resolve("Nowhere") is None
+    assert resolver.resolve("xxx") is None
+
+
+def test_typos_are_corrected_only_when_unambiguous(resolver):
+    assert resolver.resolve("Frnace") is None  # a transposition is two edits
+    assert resolver.resolve("Frence") == "fr"
+    assert resolver.resolve("Germny") == "de"
+    assert resolver.resolve("Australai") == "au"  # long enough for two edits
+    assert resolver.resolve("Irak") is None  # too short to correct
+    assert resolver.resolve("Austrlia") is None  # one edit from both Austria and Australia
+    assert resolver.resolve("Bosnia and Hercegovina") == "ba"
+    assert resolver.resolve("Brazl") == "br"  # a short guess may still be a typo of a longer name
+    # Names under six characters must be typed exactly, so everyday words are not guesses.
+    for word in ("while", "child", "chill", "chili", "woman", "stain", "indie"):
+        assert resolver.resolve(word) is None, word
+
+
+def test_long_chat_messages_are_not_matched(resolver):
+    assert resolver.resolve("I think this is somewhere in France") is None
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from location_pool import LocationPool
+
+
+def _location(country_code, pano_id):
+    return {"pano_id": pano_id, "country_code": country_code, "lat": 0.0, "lng": 0.0}
+
+
+def test_watermarks_are_validated():
+    with pytest.raises(ValueError):
+        LocationPool(None, ["fr"], low_watermark=3, high_watermark=2)
+    with pytest.raises(ValueError):
+        LocationPool(None, ["fr"], low_watermark=0, high_watermark=0)
+
+
+def test_put_stops_at_the_high_watermark():
+    pool = LocationPool(None, ["fr"], low_watermark=1, high_watermark=2)
+    assert pool.put(_location("fr", "a"))
+    assert pool.put(_location("fr", "b"))
+    assert not pool.put(_location("fr", "c"))
+    assert not pool.put(_location("de", "d"))  # not a tracked country
+    assert pool.size("FR") == 2
+    assert [pool.take("fr")["pano_id"] for _ in range(2)] == ["a", "b"]
+    assert pool.take("fr") is None
+
+
+def test_refill_fills_countries_up_to_the_high_watermark():
+    async def scenario():
+        found = []
+
+        async def finder(country_code):
+            found.append(country_code)
+            return _location(country_code, f"{country_code}-{len(found)}")
+
+        pool = LocationPool(finder, ["fr", "de"], low_watermark=1, high_watermark=3, refill_delay=0)
+        pool.start()
+        await asyncio.sleep(0.01)
+        sizes = (pool.size("fr"), pool.size("de"))
+        calls = len(found)
+
+        # Dropping to the low watermark does not refill yet; dropping below it does.
+        pool.take("fr")
+        pool.take("fr")
+        await asyncio.sleep(0.01)
+        at_low_watermark = pool.size("fr")
+        pool.take("fr")
+        await asyncio.sleep(0.01)
+        refilled = pool.size("fr")
+        await pool.stop()
+        return sizes, calls, at_low_watermark, refilled
+
+    sizes, calls, at_low_watermark, refilled = asyncio.run(scenario())
+    assert sizes == (3, 3)
+    assert calls == 6
+    assert at_low_watermark == 1
+    assert refilled == 3
+
+
+def test_set_countries_keeps_pooled_locations_of_remaining_countries():
+    pool = LocationPool(None, ["fr", "de"], low_watermark=1, high_watermark=2)
+    pool.put(_location("fr", "a"))
+    pool.put(_location("de", "b"))
+    pool.set_countries(["fr", "it"])
+    assert pool.size("fr") == 1
+    assert pool.size("de") == 0
+    assert pool.size("it") == 0
+    assert len(pool) == 1
@@ -0,0 +1,59 @@
+import asyncio
+
+import location_store
+from location_store import LocationStore
+
+
+def _location(pano_id, country_code="fr"):
+    return {"pano_id": pano_id, "country_code": country_code, "lat": 1.0, "lng": 2.0}
+
+
+def test_cached_location_waits_for_the_reuse_interval(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(location_store.time, "time", lambda: now[0])
+    store = LocationStore(":memory:", reuse_interval=60, max_serves=10)
+    store.add(_location("a"))
+    assert store.take("FR") is None
+    assert store.take("fr", ignore_reuse_interval=True)["pano_id"] == "a"
+    now[0] += 61
+    assert store.take("fr")["pano_id"] == "a"
+    assert store.take("fr") is None
+
+
+def test_least_recently_served_location_is_taken_first(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(location_store.time, "time", lambda: now[0])
+    store = LocationStore(":memory:", reuse_interval=0, max_serves=10)
+    store.add(_location("a"))
+    now[0] += 1
+    store.add(_location("b"))
+    now[0] += 1
+    assert [store.take("fr")["pano_id"] for _ in range(3)] == ["a", "b", "a"]
+
+
+def test_location_is_retired_after_max_serves():
+    store = LocationStore(":memory:", reuse_interval=0, max_serves=3)
+    store.add(_location("a"))
+    assert store.take("fr") is not None
+    assert store.take("fr") is not None  # third serve retires it
+    assert store.take("fr") is None
+    assert store.count("fr") == 0
+
+
+def test_location_store_persists_serves(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "locations.sqlite3")
+        store = LocationStore(path, reuse_interval=0, max_serves=3)
+        await store.open()
+        store.add(_location("a"))
+        store.take("fr")
+        await store.close()
+        reopened = LocationStore(path, reuse_interval=0, max_serves=3)
+        await reopened.open()
+        await reopened.close()
+        return reopened
+
+    reopened = asyncio.run(scenario())
+    assert reopened.count("fr") == 1
+    assert reopened.take("fr")["pano_id"] == "a"
+    assert reopened.count("fr") == 0
@@ -0,0 +1,55 @@
+import pytest
+
+import metrics
+from metrics import Counter, Gauge, Histogram
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    monkeypatch.setattr(metrics, "REGISTRY", [])
+
+
+def test_counter_exposition_with_and_without_labels():
+    plain = Counter("test_plain_total", "A plain counter.")
+    labelled = Counter("test_probes_total", "Probes by outcome.", ["outcome"])
+    plain.inc()
+    plain.inc(2)
+    labelled.labels("hit").inc()
+    labelled.labels('say "hi"\n').inc(3)
+    assert metrics.render_metrics() == (
+        "# HELP test_plain_total A plain counter.\n"
+        "# TYPE test_plain_total counter\n"
+        "test_plain_total 3\n"
+        "# HELP test_probes_total Probes by outcome.\n"
+        "# TYPE test_probes_total counter\n"
+        'test_probes_total{outcome="hit"} 1\n'
+        'test_probes_total{outcome="say \\"hi\\"\\n"} 3\n'
+    )
+
+
+def test_labels_must_match_the_label_names():
+    counter = Counter("test_labelled_total", "Labelled.", ["endpoint"])
+    with pytest.raises(ValueError):
+        counter.labels("geocode", "extra")
+
+
+def test_gauge_value_and_function():
+    stored = Gauge("test_stored", "Stored value.")
+    computed = Gauge("test_computed", "Computed when scraped.")
+    stored.set(4)
+    computed.set_function(lambda: 7)
+    assert stored.render().splitlines()[-1] == "test_stored 4"
+    assert computed.render().splitlines()[-1] == "test_computed 7"
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_seconds", "Latency.", ["endpoint"], buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.labels("geocode").observe(value)
+    assert histogram.render().splitlines()[2:] == [
+        'test_seconds_bucket{endpoint="geocode",le="0.1"} 2',
+        'test_seconds_bucket{endpoint="geocode",le="1"} 3',
+        'test_seconds_bucket{endpoint="geocode",le="+Inf"} 4',
+        'test_seconds_count{endpoint="geocode"} 4',
+        'test_seconds_sum{endpoint="geocode"} 3.65',
+    ]
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from rate_limit import ApiRateLimiter, BudgetExhausted, background_priority
+
+
+def test_user_calls_are_served_before_queued_background_calls():
+    async def scenario():
+        limiter = ApiRateLimiter(rate=200, burst=1)
+        order = []
+
+        async def call(name):
+            await limiter.acquire("streetview_metadata")
+            order.append(name)
+
+        await limiter.acquire("streetview_metadata")  # empty the bucket so the rest queue up
+        with background_priority():
+            background = [asyncio.create_task(call(f"background-{i}")) for i in range(2)]
+        user = [asyncio.create_task(call(f"user-{i}")) for i in range(2)]
+        await asyncio.gather(*background, *user)
+        return order
+
+    assert asyncio.run(scenario()) == ["user-0", "user-1", "background-0", "background-1"]
+
+
+def test_queued_calls_cannot_overshoot_the_budget():
+    async def scenario():
+        limiter = ApiRateLimiter(rate=200, burst=1, daily_budget=0.02, background_share=0.5)
+
+        async def call():
+            try:
+                await limiter.acquire("geocode")
+                return "ok"
+            except BudgetExhausted:
+                return "refused"
+
+        user = [asyncio.create_task(call()) for _ in range(3)]
+        with background_priority():
+            background = [asyncio.create_task(call()) for _ in range(3)]
+        return await asyncio.gather(*user, *background), limiter
+
+    results, limiter = asyncio.run(scenario())
+    assert results == ["ok", "ok", "ok", "refused", "refused", "refused"]
+    assert limiter.spent_today() == pytest.approx(0.015)
+
+
+def test_background_calls_leave_their_share_of_the_budget_to_players():
+    limiter = ApiRateLimiter(rate=1, burst=1, daily_budget=0.02, background_share=0.5)
+    with background_priority():
+        assert limiter.charge("geocode", 2)
+        assert not limiter.charge("geocode")
+        assert limiter.budget_exhausted()
+    assert not limiter.budget_exhausted()
+    assert limiter.charge("geocode", 2)
+    assert not limiter.charge("geocode")
+    assert limiter.spent_today() == pytest.approx(0.02)
+
+
+def test_shared_spend_counts_against_the_budget():
+    limiter = ApiRateLimiter(rate=1, burst=1, daily_budget=0.02)
+    limiter.shared_spent = 0.018
+    assert not limiter.charge("geocode")
+    assert limiter.charge("streetview_metadata")
+
+
+def test_budget_is_restored_from_disk(tmp_path):
+    path = tmp_path / "api_budget.json"
+    limiter = ApiRateLimiter(rate=1, burst=1, daily_budget=1.0, path=str(path))
+    limiter.charge("streetview_image", 3)
+    limiter.save()
+    restored = ApiRateLimiter(rate=1, burst=1, daily_budget=1.0, path=str(path))
+    restored.load()
+    assert restored.spent_today() == pytest.approx(0.021)
@@ -0,0 +1,73 @@
+import pytest
+
+from search_stats import SearchStats
+
+
+def _record(stats, country_code, radius, hits, misses, sampler="polygon"):
+    for _ in range(hits):
+        stats.record_probe(country_code, sampler, radius, "hit")
+    for _ in range(misses):
+        stats.record_probe(country_code, sampler, radius, "no_pano")
+
+
+def test_unknown_outcomes_are_rejected():
+    with pytest.raises(ValueError):
+        SearchStats().record_probe("fr", "polygon", 1000, "maybe")
+
+
+def test_radius_order_prefers_the_radius_that_finds_panoramas():
+    stats = SearchStats()
+    assert stats.radius_order("fr", [1000, 10000, 50000]) == [1000, 10000, 50000]
+    _record(stats, "fr", 1000, hits=0, misses=8)
+    _record(stats, "fr", 10000, hits=1, misses=7)
+    _record(stats, "fr", 50000, hits=6, misses=2)
+    assert stats.radius_order("FR", [1000, 10000, 50000]) == [50000, 10000, 1000]
+
+
+def test_radius_order_smooths_radii_that_were_never_tried():
+    stats = SearchStats()
+    _record(stats, "fr", 1000, hits=0, misses=4)
+    # An untried radius scores 1/2, ahead of one that keeps missing.
+    assert stats.radius_order("fr", [1000, 10000]) == [10000, 1000]
+
+
+def test_attempt_budget_follows_attempts_per_success():
+    stats = SearchStats(min_budget=10, max_budget=60)
+    for _ in range(2):
+        stats.record_search("fr", True)
+    _record(stats, "fr", 1000, hits=2, misses=12)
+    assert stats.attempt_budget("fr", default=25) == 25  # too few searches to judge
+    stats.record_search("fr", True)
+    _record(stats, "fr", 1000, hits=1, misses=1)
+    assert stats.attempts_per_success("fr") == pytest.approx(16 / 3)
+    assert stats.attempt_budget("fr", default=25) == 16
+
+
+def test_attempt_budget_is_clamped():
+    stats = SearchStats(min_budget=10, max_budget=60)
+    for _ in range(3):
+        stats.record_search("fr", True)
+        stats.record_search("ru", False)
+    _record(stats, "fr", 1000, hits=3, misses=0)
+    _record(stats, "ru", 1000, hits=0, misses=30)
+    assert stats.attempt_budget("fr", default=25) == 10
+    assert stats.attempt_budget("ru", default=25) == 60
+
+
+def test_wrong_country_rate_counts_found_panoramas_only():
+    stats = SearchStats()
+    _record(stats, "fr", 1000, hits=3, misses=5)
+    stats.record_probe("fr", "polygon", 1000, "wrong_country")
+    assert stats.wrong_country_rate("fr") == pytest.approx(0.25)
+
+
+def test_stats_survive_a_save_and_load(tmp_path):
+    path = str(tmp_path / "search_stats.json")
+    stats = SearchStats(path)
+    stats.record_search("fr", True)
+    _record(stats, "fr", 10000, hits=1, misses=2, sampler="bbox")
+    stats.save()
+    loaded = SearchStats(path)
+    loaded.load()
+    assert loaded.snapshot() == stats.snapshot()
+    assert loaded.hit_rates() == {"fr": {"bbox": (1, 3)}}
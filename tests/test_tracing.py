@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+import tracing
+from tracing import Tracer
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(tracing.time, "perf_counter", lambda: now[0])
+    return now
+
+
+def _record(tracer, clock, name, seconds, **attributes):
+    with tracer.span(name, **attributes):
+        clock[0] += seconds
+
+
+def test_percentiles_per_stage_and_country(clock):
+    tracer = Tracer(log_spans=False)
+    for millis in range(1, 101):
+        _record(tracer, clock, "search", millis / 1000, country="FR")
+    _record(tracer, clock, "search", 5.0, country="de")
+    _record(tracer, clock, "send", 0.2, country="fr")
+
+    rows = dict((stage, rest) for stage, *rest in tracer.percentiles("fr"))
+    assert rows["search"] == [100, pytest.approx(0.051), pytest.approx(0.091), pytest.approx(0.1)]
+    assert rows["send"] == [1, pytest.approx(0.2), pytest.approx(0.2), pytest.approx(0.2)]
+    stage, count, p50, p90, p99 = tracer.percentiles()[0]
+    assert (stage, count) == ("search", 101)
+    assert p99 == pytest.approx(0.1)  # one outlier in 101 does not reach p99
+    assert tracer.percentiles("it") == []
+
+
+def test_window_keeps_only_the_latest_durations(clock):
+    tracer = Tracer(window=3, log_spans=False)
+    for seconds in (10, 20, 1, 2, 3):
+        _record(tracer, clock, "search", seconds)
+    assert tracer.percentiles() == [("search", 3, 2, 3, 3)]
+
+
+def test_kind_splits_stages_and_errors_are_recorded(clock):
+    tracer = Tracer(log_spans=False)
+    _record(tracer, clock, "probe", 1, kind="metadata")
+    with pytest.raises(RuntimeError):
+        with tracer.span("probe", kind="geocode") as span:
+            raise RuntimeError("boom")
+    assert span.attributes["error"] == "RuntimeError"
+    assert [row[0] for row in tracer.percentiles()] == ["probe:geocode", "probe:metadata"]
+
+
+def test_trace_id_and_country_flow_into_child_spans_and_tasks():
+    tracer = Tracer(log_spans=False)
+
+    async def child():
+        with tracer.span("child") as span:
+            return span.attributes
+
+    async def scenario():
+        with tracer.trace("game_start") as root:
+            root.set(country="fr")
+            task = asyncio.create_task(child())
+            attributes = await task
+        return root.attributes, attributes
+
+    root, child_attributes = asyncio.run(scenario())
+    assert child_attributes["trace_id"] == root["trace_id"]
+    assert child_attributes["country"] == "fr"
+    with tracer.span("after") as span:
+        assert "trace_id" not in span.attributes
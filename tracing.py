@@ -0,0 +1,106 @@
+import contextvars
+import itertools
+import json
+import logging
+import time
+from collections import defaultdict, deque
+
+
+logger = logging.getLogger("countryguesser.trace")
+
+# Attributes of the enclosing span that child spans inherit (copied into tasks created inside it)
+_inherited = contextvars.ContextVar("trace_inherited", default={})
+_trace_ids = itertools.count(1)
+
+INHERITED_ATTRIBUTES = ("trace_id", "country")
+
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+class Span:
+    __slots__ = ("tracer", "name", "attributes", "_start", "_token")
+
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+
+    def set(self, **attributes):
+        """Add attributes once they are known (e.g. the chosen country or a probe outcome)."""
+        self.attributes.update(attributes)
+        inherited = {key: attributes[key] for key in INHERITED_ATTRIBUTES if key in attributes}
+        if inherited:
+            _inherited.set({**_inherited.get(), **inherited})
+
+    def __enter__(self):
+        inherited = _inherited.get()
+        self.attributes = {**inherited, **self.attributes}
+        self._token = _inherited.set({key: self.attributes[key] for key in INHERITED_ATTRIBUTES if key in self.attributes})
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._start
+        _inherited.reset(self._token)
+        if exc_type is not None:
+            self.attributes.setdefault("error", exc_type.__name__)
+        self.tracer._finish(self, duration)
+        return False
+
+
+class Tracer:
+    """Timing spans for the game-start pipeline.
+
+    Spans are plain context managers that cost two ``perf_counter`` calls and a
+    deque append. Each finished span is written to the ``countryguesser.trace``
+    logger as one JSON object and its duration is kept in a bounded window per
+    (stage, country) so percentiles can be queried at runtime. ``trace_id`` and
+    ``country`` flow from a span to every span opened inside it, including
+    tasks created inside it.
+    """
+
+    def __init__(self, window=500, log_spans=True):
+        self.log_spans = log_spans
+        self._durations = defaultdict(lambda: deque(maxlen=window))
+
+    def trace(self, name, **attributes):
+        """Open a root span with a new trace id."""
+        attributes["trace_id"] = next(_trace_ids)
+        return Span(self, name, attributes)
+
+    def span(self, name, **attributes):
+        return Span(self, name, attributes)
+
+    def _finish(self, span, duration):
+        country = span.attributes.get("country")
+        kind = span.attributes.get("kind")
+        stage = f"{span.name}:{kind}" if kind else span.name
+        self._durations[(stage, country.lower() if country else None)].append(duration)
+        if self.log_spans and logger.isEnabledFor(logging.INFO):
+            record = {"span": span.name, "duration_ms": round(duration * 1000, 2), **span.attributes}
+            logger.info(json.dumps(record, default=str))
+
+    def percentiles(self, country=None):
+        """Return [(stage, count, p50, p90, p99)] in seconds, for one country or across all of them."""
+        by_stage = defaultdict(list)
+        for (stage, span_country), durations in self._durations.items():
+            if country is None or span_country == country.lower():
+                by_stage[stage].extend(durations)
+        rows = []
+        for stage, durations in sorted(by_stage.items()):
+            durations.sort()
+            rows.append((stage, len(durations), _percentile(durations, 0.5), _percentile(durations, 0.9), _percentile(durations, 0.99)))
+        return rows
+
+    def summary_lines(self, country=None):
+        """Human-readable percentile table for the owner command."""
+        rows = self.percentiles(country)
+        if not rows:
+            return []
+        lines = [f"{'stage':<16} {'n':>5} {'p50':>8} {'p90':>8} {'p99':>8}"]
+        for stage, count, p50, p90, p99 in rows:
+            lines.append(f"{stage:<16} {count:>5} {p50 * 1000:>6.0f}ms {p90 * 1000:>6.0f}ms {p99 * 1000:>6.0f}ms")
+        return lines